@@ -1,17 +1,26 @@
 import os
+import json
+import threading
 import time
 import bcrypt
-from flask import Flask, Response, abort, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, abort, g, request, jsonify, send_file, send_from_directory, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.utils import secure_filename
 
-from text import TextProfanityFilter
-from audio import AudioProfanityFilter
-from image import ImageProfanityFilter
+from models import get_audio_filter, get_image_filter, get_text_filter
 from video import VideoProfanityDetection
-from database import DatabaseOPS
+from textstream import TextStreamModerator
+from database import DatabaseOPS, get_pool
+from cache import verdict_cache
+from dedup import image_cache
+from registry import model_registry, whisper_registry
+from batching import MicroBatcher
+from jobs import JobQueue, QueueFull
+from progress import AUDIO_STAGES, VIDEO_STAGES, ProgressTracker
+from regions import LOCALIZE
+from resultcache import request_key, result_cache, save_and_hash
 import utils
 from mailer import send_mailtrap_email
 import random
@@ -25,15 +34,23 @@ CORS(app)
 
 # print(f"Flask expects static files in: {os.path.abspath(app.static_folder)}")
 
-tpf = TextProfanityFilter()  # Instance of TextProfanityFilter
-apf = AudioProfanityFilter(textpf=tpf)  # Instance of AudioProfanityFilter
-ipd = ImageProfanityFilter()  # Instance of ImageProfanityFilter
+# Shared instances from the model registry, also used by every video request.
+# Created by startup(), not at import time: worker processes started with
+# "spawn" re-import this module and must not load models or run jobs.
+tpf = None  # Instance of TextProfanityFilter
+apf = None  # Instance of AudioProfanityFilter
+ipd = None  # Instance of ImageProfanityFilter
+image_batcher = None  # Concurrent /imgmoderation requests share CLIP forward passes
+job_queue = None  # Background audio/video jobs; opening it creates the jobs database
+startup_lock = threading.Lock()
+started = False
 
 # Configure upload folder and allowed extensions
 UPLOAD_FOLDER = "./storage/uploads"
 STATIC_FOLDER = "./storage/files"
 ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 ALLOWED_VIDEO_EXTENSIONS = {"mp4", "mov", "avi"}
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", 0.5))  # How often job events check for progress
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
 # Ensure upload folder exists
@@ -43,6 +60,22 @@ if not os.path.exists("storage/imgs"):
     os.makedirs("storage/imgs")
 
 
+def get_db() -> DatabaseOPS:
+    """
+    Returns the pooled DatabaseOPS of the current request, released in close_db().
+    """
+    if "db" not in g:
+        g.db = DatabaseOPS()
+    return g.db
+
+
+@app.teardown_appcontext
+def close_db(exception):
+    db = g.pop("db", None)
+    if db is not None:
+        db.close()  # Return the connection to the pool
+
+
 def allowed_image_file(filename):
     return (
         "." in filename
@@ -62,6 +95,23 @@ def allowed_video_file(filename):
 def Main():
     return "<h1>Content Moderation APIs are live...</h1>"
 
+
+# Runtime Metrics Endpoint
+@app.route("/api/metrics")
+def metrics():
+    return jsonify(
+        {
+            "verdict_cache": verdict_cache.stats(),
+            "db_pool": get_pool().stats(),
+            "whisper": whisper_registry.stats(),
+            "models": model_registry.stats(),
+            "image_batcher": image_batcher.stats(),
+            "image_cache": image_cache.stats(),
+            "result_cache": result_cache.stats(),
+            "jobs": job_queue.stats(),
+        }
+    ), 200
+
 # Mail sender endpoint
 @app.route('/send_otp', methods=['POST'])
 def send_mailtrap():
@@ -72,7 +122,7 @@ def send_mailtrap():
     code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6)) # Generate a random 6-character code
     if not to_email or not subject or not text:
         return jsonify({"success": False, "error": "Missing required fields"}), 400
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     DaOPS.set_forget_token(email=to_email, forget_token=code)  # Set forget token in the database
     result = send_mailtrap_email(to_email, otp=code, subject=subject) # Send email using Mailtrap
     status_code = 200 if result.get("success") else 500
@@ -88,7 +138,7 @@ def verify_otp():
     if not to_email or not otp:
         return jsonify({"success": False, "error": "Missing required fields"}), 400
     
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     stored_otp = DaOPS.get_forget_token(email=to_email)
     
     if stored_otp is None:
@@ -122,7 +172,7 @@ def register():
     salt = bcrypt.gensalt()  # Generates a random salt
     hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
 
-    DaOPS = DatabaseOPS()  # DatabaseOPS instance
+    DaOPS = get_db()  # DatabaseOPS instance
     isInserted = DaOPS.inserting_data_in_users(
         username=username, email=email_id, password=hashed_password
     )
@@ -141,7 +191,7 @@ def login():
     email = data["email_id"]
     password = data["password"]  # Plain password from user input
 
-    DaOPS = DatabaseOPS()  # DatabaseOPS instance
+    DaOPS = get_db()  # DatabaseOPS instance
     stored_pwd_hash = DaOPS.get_password(email_id=email)
 
     if stored_pwd_hash is None:
@@ -209,7 +259,7 @@ def refresh_tokens():
         user_id=user_id, user_email=email, user_name=user_name
     )
 
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
 
     if (
         DaOPS.set_tokens(
@@ -231,7 +281,7 @@ def logout():
     data = request.get_json()
     refresh_token = data["refresh_token"]
 
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     if DaOPS.logout(refresh_token=refresh_token) == 1:
         return jsonify({"message": "Logged out successfully."}), 200
     else:
@@ -242,7 +292,7 @@ def forget_password():
     data = request.get_json()
     email = data["email_id"]
 
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     user_data = DaOPS.get_user_data(email_id=email)
 
     if user_data is None:
@@ -341,7 +391,8 @@ def TextModeration():
         for x in r:
             output_content += x["FilteredWord"] + " "
 
-    DaOPS = DatabaseOPS()
+    # All rows of this request are written in one transaction
+    DaOPS = get_db()
     input_content_id = DaOPS.insert_input_content(
         user_id=user_id,
         content_type="TEXT",
@@ -349,35 +400,47 @@ def TextModeration():
         mask_character=mask_character,
         output_content=output_content,
         project_name=project_name,
+        commit=False,
     )
 
-    if input_content_id is not None:
-
-        for x in custom_words:  # Inserting custom words into the database
-            try:
-                DaOPS.insert_custom_words(input_content_id=input_content_id, custom_word=x)
-            except Exception as e:
-                print(f"Error from app.py in inserting custom words is: {e}")
-        for x in r:  # Inserting processed text into the database
-            try:
-                DaOPS.insert_processed_text(
-                    input_content_id=input_content_id,
-                    original_word=x["OriginalWord"],
-                    is_flagged=x["IsProfane"],
-                    filtered_word=x["FilteredWord"],
-                )
-            except Exception as e:
-                print(f"Error from app.py in inserting_processed_text is: {e}")
-                return (
-                    jsonify(
-                        {
-                            "error": "Internal server error while inserting data in processed text table"
-                        }
-                    ),
-                    500,
-                )
+    if input_content_id is not None and not isinstance(input_content_id, Exception):
+        # Inserting custom words into the database; a failure rolls back the whole request
+        if DaOPS.insert_custom_words_bulk(
+            input_content_id=input_content_id, custom_words=custom_words, commit=False
+        ) != 1:
+            print("Error from app.py in inserting custom words")
+            DaOPS.rollback()
+            return (
+                jsonify(
+                    {
+                        "error": "Internal server error while inserting data in custom words table"
+                    }
+                ),
+                500,
+            )
+
+        # Inserting processed text into the database
+        if (
+            DaOPS.insert_processed_text_bulk(
+                input_content_id=input_content_id,
+                rows=[(x["OriginalWord"], x["IsProfane"], x["FilteredWord"]) for x in r],
+                commit=False,
+            )
+            != 1
+            or DaOPS.commit() != 1
+        ):
+            DaOPS.rollback()
+            return (
+                jsonify(
+                    {
+                        "error": "Internal server error while inserting data in processed text table"
+                    }
+                ),
+                500,
+            )
         return jsonify(r), 200
     else:
+        DaOPS.rollback()
         return jsonify({"error": "Internal server error"}), 500
 
 # Text File Moderation Endpoint
@@ -406,36 +469,47 @@ def TxtFileModeration():
     mask_char = request.form.get("mask_char", "*")
     custom_words = request.form.getlist("custom_words")
     project_name = request.form.get("project_name", str(int(time.time())))
+    stream = request.form.get("stream", "false").lower() in ("1", "true", "yes")
 
     # Save uploaded file
     input_path = os.path.join("storage/uploads", filename)
     txt_file.save(input_path)
 
-    # Moderate each line
-    moderated_lines = []
-    report = []
-    with open(input_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            result = tpf.textProfanityFilteration(
-                profane_sentence=line,
-                mask_char=mask_char,
-                custom_words=custom_words,
-            )
-            # Join filtered words for the moderated line
-            moderated_line = " ".join([x["FilteredWord"] for x in result])
-            moderated_lines.append(moderated_line)
-            report.append(result)
-
-    # Save moderated file
-    moderated_filename = f"{int(time.time())}.txt"
+    moderated_filename = utils.unique_filename("txt")
     moderated_path = os.path.join("storage/files", moderated_filename)
-    with open(moderated_path, "w", encoding="utf-8") as f:
-        for line in moderated_lines:
-            f.write(line + "\n")
+    moderator = TextStreamModerator(
+        mask_char=mask_char, custom_words=custom_words, textpf=tpf
+    )
+
+    if stream:
+        # Stream the report back as NDJSON while the moderated file is written
+        def generate():
+            yield json.dumps({"moderated_file_path": moderated_filename}) + "\n"
+            with open(input_path, "r", encoding="utf-8", errors="replace") as f:
+                for record in moderator.moderate_to_file(f, moderated_path):
+                    yield json.dumps(record) + "\n"
+
+            with DatabaseOPS() as DaOPS:
+                DaOPS.insert_input_content(
+                    user_id=user_id,
+                    content_type="TEXT_FILE",
+                    input_content=input_path,
+                    mask_character=mask_char,
+                    output_content=moderated_path,
+                    project_name=project_name,
+                )
+            yield json.dumps({"done": True}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    # Moderate the file in batches of lines and write the moderated file
+    report = []
+    with open(input_path, "r", encoding="utf-8", errors="replace") as f:
+        for record in moderator.moderate_to_file(f, moderated_path):
+            report.append(record["report"])
 
     # Optionally, insert into DB (similar to other endpoints)
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     input_content_id = DaOPS.insert_input_content(
         user_id=user_id,
         content_type="TEXT_FILE",
@@ -445,18 +519,102 @@ def TxtFileModeration():
         project_name=project_name,
     )
 
-    # Prepare moderated text for JSON (add \n at end of each line)
-    moderated_text = "\n".join(moderated_lines) + "\n" if moderated_lines else ""
-
     # Return download link and report
     return jsonify({
         "moderated_file_path": moderated_filename,
-        # "moderated_text": moderated_text,
         "report": report
     }), 200
 
 
 # Audio Moderation Endpoint
+def moderate_audio(
+    user_id,
+    filepath: str,
+    content_hash: str,
+    mask_char: str,
+    custom_words: list,
+    project_name: str,
+    job_id: str | None = None,
+):
+    """
+    Moderates a saved audio upload and records it in the database.
+    Runs inside /audiomoderation or, for async requests, in a job worker.
+    Returns (response data, status code).
+    """
+    # Identical uploads with identical settings reuse the previous output
+    cache_key = request_key(
+        "AUDIO",
+        content_hash,
+        mask_char=mask_char,
+        custom_words=custom_words,
+        artifacts=verdict_cache.artifact_fingerprint(),
+    )
+    cached = result_cache.get(cache_key)
+
+    timings = {}  # Whisper load / queue / transcription time of this request
+    if cached is not None:
+        output_path, profanity_data = cached["output_path"], cached["profanity_data"]
+    else:
+        output_path, profanity_data = apf.audioProfanityFilteration(
+            audio_path=filepath,
+            output_file_name=utils.unique_filename("mp3"),
+            mask_char=mask_char,
+            custom_words=custom_words,
+            timings=timings,
+            progress=job_progress(job_id, AUDIO_STAGES),
+        )
+        if output_path:
+            result_cache.put(
+                cache_key,
+                {"output_path": output_path, "profanity_data": profanity_data},
+                artifacts=[output_path],
+            )
+
+    # All rows of this request are written in one transaction
+    DaOPS = get_db()
+    input_content_id = DaOPS.insert_input_content(
+        user_id=user_id,
+        content_type="AUDIO",
+        input_content=filepath,
+        mask_character=mask_char,
+        output_content=output_path,
+        project_name=project_name,
+        commit=False,
+    )
+
+    if input_content_id is not None and not isinstance(input_content_id, Exception):
+        if (
+            DaOPS.insert_custom_words_bulk(
+                input_content_id=input_content_id, custom_words=custom_words, commit=False
+            )
+            != 1
+            or DaOPS.insert_processed_audio_bulk(
+                input_content_id=input_content_id,
+                rows=[
+                    (x["Start"], x["End"], x["IsProfane"], x["OriginalWord"], x["FilteredWord"])
+                    for x in profanity_data
+                ],
+                commit=False,
+            )
+            != 1
+            or DaOPS.commit() != 1
+        ):
+            DaOPS.rollback()
+            return {"error": "Internal server error while inserting data in processed audio table"}, 500
+        return (
+            {
+                "output_path": output_path,
+                "profanity_data": profanity_data,
+                "timings": timings,
+                "cached": cached is not None,
+            },
+            200,
+        )
+    else:
+        DaOPS.rollback()
+        return {"error": "Internal server error"}, 500
+
+
 @app.route("/audiomoderation", methods=["POST"])
 def AudioModeration():
     auth_token = request.headers.get(
@@ -493,49 +651,24 @@ def AudioModeration():
     filepath = os.path.join(
         STATIC_FOLDER, filename
     )  # Save the audio file to ./storage/files
-    audio_file.save(filepath)  # Saving the audio file to the upload folder
+    content_hash = save_and_hash(audio_file, filepath)  # Saving and hashing in one pass
     print(f"Audio file saved to: {filepath}")
 
-    output_path, profanity_data = apf.audioProfanityFilteration(
-        audio_path=filepath,
-        output_file_name=f"{str(int(time.time()))}.mp3",
-        mask_char=mask_char,
-        custom_words=custom_bad_words,
-    )
+    params = {
+        "user_id": user_id,
+        "filepath": filepath,
+        "content_hash": content_hash,
+        "mask_char": mask_char,
+        "custom_words": custom_bad_words,
+        "project_name": project_name,
+    }
 
-    DaOPS = DatabaseOPS()
-    input_content_id = DaOPS.insert_input_content(
-        user_id=user_id,
-        content_type="AUDIO",
-        input_content=filepath,
-        mask_character=mask_char,
-        output_content=output_path,
-        project_name=project_name,
-    )
+    # With async=true the file is moderated in the background, poll /api/jobs/<job_id>
+    if request.form.get("async", "false").lower() == "true":
+        return submit_job("AUDIO", params, user_id)
 
-    if input_content_id is not None:
-        for x in custom_bad_words:
-            DaOPS.insert_custom_words(input_content_id=input_content_id, custom_word=x)
-        for x in profanity_data:
-            DaOPS.insert_processed_audio(
-                input_content_id=input_content_id,
-                start_time=x["Start"],
-                end_time=x["End"],
-                is_flagged=x["IsProfane"],
-                original_word=x["OriginalWord"],
-                filtered_word=x["FilteredWord"],
-            )
-        return (
-            jsonify(
-                {
-                    "output_path": output_path,
-                    "profanity_data": profanity_data,
-                }
-            ),
-            200,
-        )
-    else:
-        return jsonify({"error": "Internal server error"}), 500
+    result, status_code = moderate_audio(**params)
+    return jsonify(result), status_code
 
 
 # Image Moderation Endpoint
@@ -589,20 +722,45 @@ def ImageModeration():
                 400,
             )
 
-        # Save uploaded image
-        filepath = os.path.join("storage/files/", filename)
-        image_file.save(filepath)
-
-        r = ipd.detect(image_path=filepath)  # Detecting profanity in image
+        # With localize=true only the regions showing the detected content are blurred
+        localize = request.form.get("localize", str(LOCALIZE)).lower() == "true"
 
-        blured_image_path = ipd.blur_image(
-            input_path=filepath, blur_radius=blur_radius
-        )  # Applying blur if it is flagged
-        r["blured_image_path"] = (
-            blured_image_path  # Adding new key value pair in response
+        # Save and hash uploaded image
+        filepath = os.path.join("storage/files/", filename)
+        content_hash = save_and_hash(image_file, filepath)
+
+        # Identical uploads with identical settings reuse the previous output
+        cache_key = request_key(
+            "IMAGE",
+            content_hash,
+            blur_radius=blur_radius,
+            localize=localize,
+            model=ipd.cache_namespace,
         )
+        r = result_cache.get(cache_key)
+        if r is not None:
+            blured_image_path = r["blured_image_path"]
+            r["cached"] = True
+        else:
+            r = image_batcher.submit(filepath).result()  # Detecting profanity in image
+            if localize:
+                r["regions"] = ipd.localize_batch([filepath], [r])[0]
+
+            # Clean images are not blurred, the output is a copy of the upload
+            blured_image_path = ipd.blur_image(
+                input_path=filepath,
+                blur_radius=blur_radius,
+                regions=r.get("regions"),
+                flagged=r["isFlagged"],
+            )
+            r["blured_image_path"] = (
+                blured_image_path  # Adding new key value pair in response
+            )
+            result_cache.put(cache_key, r, artifacts=[blured_image_path])
+            r["cached"] = False
 
-        DaOPS = DatabaseOPS()
+        # All rows of this request are written in one transaction
+        DaOPS = get_db()
         input_content_id = DaOPS.insert_input_content(
             user_id=user_id,
             content_type="IMAGE",
@@ -610,52 +768,164 @@ def ImageModeration():
             mask_character="",
             output_content=blured_image_path,
             project_name=project_name,
+            commit=False,
         )
-
-        if input_content_id is not None:
-            for x in r["harmful_detected"]:
-                if (
-                    DaOPS.insert_processed_image(
-                        input_content_id=input_content_id,
-                        detected_content=x,
-                        is_flagged=r["isFlagged"],
-                    )
-                    != 1
-                ):
-                    return (
-                        jsonify(
-                            {
-                                "error": "Internal server error while inserting data in processed image table"
-                            }
-                        ),
-                        500,
-                    )
-
-            if (
-                DaOPS.insert_visual_content_features(
-                    input_content_id=input_content_id,
-                    blur_radius=str(blur_radius),
-                    fps=0,
-                )
-                != 1
-            ):
-                return (
-                    jsonify(
-                        {
-                            "error": "Internal server error while inseting data in insert_visual_content_features table"
-                        }
-                    ),
-                    500,
-                )
-            return jsonify(r), 200
-        else:
+        if input_content_id is None or isinstance(input_content_id, Exception):
+            DaOPS.rollback()
             return jsonify({"error": "Internal server error"}), 500
 
+        if (
+            DaOPS.insert_processed_image_bulk(
+                input_content_id=input_content_id,
+                rows=[(x, r["isFlagged"]) for x in r["harmful_detected"]],
+                commit=False,
+            )
+            != 1
+            or DaOPS.insert_detected_regions_bulk(
+                input_content_id=input_content_id,
+                rows=[
+                    (None, None, *region["box"], detected_content)
+                    for region in r.get("regions", [])
+                    for detected_content in region["harmful_detected"]
+                ],
+                commit=False,
+            )
+            != 1
+            or DaOPS.insert_visual_content_features(
+                input_content_id=input_content_id,
+                blur_radius=str(blur_radius),
+                fps=0,
+                commit=False,
+            )
+            != 1
+            or DaOPS.commit() != 1
+        ):
+            DaOPS.rollback()
+            return (
+                jsonify(
+                    {
+                        "error": "Internal server error while inserting data in processed image table"
+                    }
+                ),
+                500,
+            )
+        return jsonify(r), 200
+
     except Exception as e:
         print("error: Processing error", str(e))
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
 
+def moderate_video(
+    user_id,
+    input_file_path: str,
+    content_hash: str,
+    mask_char: str,
+    custom_words: list,
+    blur_radius: int,
+    project_name: str,
+    localize: bool = LOCALIZE,
+    job_id: str | None = None,
+):
+    """
+    Moderates a saved video upload and records it in the database.
+    Runs inside /videomoderation or, for async requests, in a job worker.
+    Returns (response data, status code).
+    """
+    # Identical uploads with identical settings reuse the previous output
+    cache_key = request_key(
+        "VIDEO",
+        content_hash,
+        mask_char=mask_char,
+        custom_words=custom_words,
+        blur_radius=blur_radius,
+        localize=localize,
+        artifacts=verdict_cache.artifact_fingerprint(),
+        model=ipd.cache_namespace,
+    )
+    r = result_cache.get(cache_key)
+    if r is not None:
+        r["cached"] = True
+    else:
+        # Using VideoProfanityDetection class for detection
+        vpf = VideoProfanityDetection(
+            input_video=input_file_path, custom_words=custom_words, mask_char=mask_char
+        )
+
+        r = vpf.video_moderation(
+            blur_video=True,
+            progress=job_progress(job_id, VIDEO_STAGES),
+            localize=localize,
+        )
+        if "error" in r:
+            return r, 500
+        result_cache.put(cache_key, r, artifacts=[r["moderated_video_path"]])
+        r["cached"] = False
+
+    # All rows of this request are written in one transaction
+    DaOPS = get_db()
+    input_content_id = DaOPS.insert_input_content(
+        user_id=user_id,
+        content_type="VIDEO",
+        input_content=input_file_path,
+        mask_character=mask_char,
+        output_content=r["moderated_video_path"],
+        project_name=project_name,
+        commit=False,
+    )
+    if input_content_id is None or isinstance(input_content_id, Exception):
+        DaOPS.rollback()
+        return {"error": "Internal server error"}, 500
+
+    if (
+        DaOPS.insert_processed_audio_bulk(
+            input_content_id=input_content_id,
+            rows=[
+                (x["Start"], x["End"], x["IsProfane"], x["OriginalWord"], x["FilteredWord"])
+                for x in r["text_moderated_data"]
+            ],
+            commit=False,
+        )
+        != 1
+    ):
+        DaOPS.rollback()
+        return {"error": "Internal server error while inserting data in processed audio table"}, 500
+
+    # processed_video ids are needed for the detections, so those rows go one by one
+    detections = []
+    for x in r["image_detections"]:
+        primary_key = DaOPS.insert_processed_video(
+            input_content_id=input_content_id,
+            start_second=x["second"],
+            end_second=x["second"] + 1,
+            commit=False,
+        )
+        if isinstance(primary_key, Exception):
+            DaOPS.rollback()
+            return {"error": "Internal server error while inserting data in processed video table"}, 500
+        for detected_content in x["harmful_detected"]:
+            detections.append((str(primary_key), detected_content))
+
+    if (
+        DaOPS.insert_video_content_detections_bulk(rows=detections, commit=False) != 1
+        or DaOPS.insert_detected_regions_bulk(
+            input_content_id=input_content_id,
+            rows=[
+                (x["second"], x["second"] + 1, *region["box"], detected_content)
+                for x in r["image_detections"]
+                for region in x.get("regions", [])
+                for detected_content in region["harmful_detected"]
+            ],
+            commit=False,
+        )
+        != 1
+        or DaOPS.commit() != 1
+    ):
+        DaOPS.rollback()
+        return {"error": "Internal server error while inserting data in video detections table"}, 500
+    return r, 200
+
+
 # Video Moderation Endpoint
 @app.route("/videomoderation", methods=["POST"])
 def VideoModeration():
@@ -715,54 +985,170 @@ def VideoModeration():
         # Getting custom profane words
         words = request.form.getlist("custom_words")
 
-        # Save uploaded video
+        # Save and hash uploaded video
         input_file_path = os.path.join("storage/files", filename)
-        video_file.save(input_file_path)
+        content_hash = save_and_hash(video_file, input_file_path)
+
+        params = {
+            "user_id": user_id,
+            "input_file_path": input_file_path,
+            "content_hash": content_hash,
+            "mask_char": mask_char,
+            "custom_words": words,
+            "blur_radius": blur_radius,
+            "project_name": project_name,
+            # With localize=true only the regions showing the detected content are blurred
+            "localize": request.form.get("localize", str(LOCALIZE)).lower() == "true",
+        }
+
+        # With async=true the video is moderated in the background, poll /api/jobs/<job_id>
+        if request.form.get("async", "false").lower() == "true":
+            return submit_job("VIDEO", params, user_id)
+
+        result, status_code = moderate_video(**params)
+        return jsonify(result), status_code
 
-        # Using VideoProfanityDetection class for detection
-        vpf = VideoProfanityDetection(
-            input_video=input_file_path, custom_words=words, mask_char=mask_char
-        )
+    except Exception as e:
+        print(f"Internal error occured. Error is:\n {e}")
+        return jsonify(f"Internal error occured. Error is:\n {e}"), 200
 
-        r = vpf.video_moderation(blur_video=True)
 
-        DaOPS = DatabaseOPS()
-        input_content_id = DaOPS.insert_input_content(
-            user_id=user_id,
-            content_type="VIDEO",
-            input_content=input_file_path,
-            mask_character=mask_char,
-            output_content=r["moderated_video_path"],
-            project_name=project_name,
+def run_in_app_context(function):
+    """Wraps a moderation function so job workers get their own app context and DB connection."""
+
+    def handler(params: dict, job_id: str):
+        with app.app_context():
+            return function(**params, job_id=job_id)
+
+    return handler
+
+
+def startup():
+    """
+    Load the shared models and start the job workers, once per serving process.
+    Called before serving by __main__ and, for WSGI servers, on the first request.
+    """
+    global tpf, apf, ipd, image_batcher, job_queue, started
+    with startup_lock:
+        if started:
+            return
+
+        tpf = get_text_filter()
+        apf = get_audio_filter()
+        ipd = get_image_filter()
+        image_batcher = MicroBatcher(
+            ipd.detect_batch,
+            max_batch_size=int(os.getenv("IMG_BATCH_SIZE", 16)),
+            max_wait_ms=float(os.getenv("IMG_BATCH_WAIT_MS", 10)),
         )
 
-        for x in r["text_moderated_data"]:
-            DaOPS.insert_processed_audio(
-                input_content_id=input_content_id,
-                start_time=x["Start"],
-                end_time=x["End"],
-                is_flagged=x["IsProfane"],
-                original_word=x["OriginalWord"],
-                filtered_word=x["FilteredWord"],
-            )
+        # Load the Whisper models now instead of on the first request
+        whisper_registry.preload(os.getenv("WHISPER_PRELOAD", "tiny").split(","))
 
-        for x in r["image_detections"]:
-            primary_key = DaOPS.insert_processed_video(
-                input_content_id=input_content_id,
-                start_second=x["second"],
-                end_second=x["second"] + 1,
-            )
-            if len(x["harmful_detected"]) > 0:
-                for detected_content in x["harmful_detected"]:
-                    DaOPS.insert_video_content_detections(
-                        processed_video_id=str(primary_key),
-                        detected_content=detected_content,
-                    )
-        return jsonify(r), 200
+        job_queue = JobQueue()
+        job_queue.register("AUDIO", run_in_app_context(moderate_audio))
+        job_queue.register("VIDEO", run_in_app_context(moderate_video))
+        job_queue.start()
+        started = True
 
-    except Exception as e:
-        print(f"Internal error occured. Error is:\n {e}")
-        return jsonify(f"Internal error occured. Error is:\n {e}"), 200
+
+@app.before_request
+def ensure_started():
+    startup()
+
+
+def job_progress(job_id: str | None, stages: list) -> ProgressTracker | None:
+    """Progress tracker that saves its snapshots on the job, None outside of jobs."""
+    if job_id is None:
+        return None
+    return ProgressTracker(
+        stages, on_update=lambda snapshot: job_queue.set_progress(job_id, snapshot)
+    )
+
+
+def submit_job(kind: str, params: dict, user_id):
+    try:
+        job_id = job_queue.submit(kind, params, user_id=user_id)
+    except QueueFull:
+        # Admission control: this node already has as many heavy jobs as it takes
+        return jsonify({"error": "Server busy, try again later"}), 503
+    if job_id is None:
+        return jsonify({"error": "Internal server error"}), 500
+    return (
+        jsonify(
+            {
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/api/jobs/{job_id}",
+                "events_url": f"/api/jobs/{job_id}/events",
+            }
+        ),
+        202,
+    )
+
+
+# Job Status Endpoint
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def JobStatus(job_id):
+    auth_token = request.headers.get("Authorization")
+    if not auth_token:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    decoded_token = utils.verify_token(auth_token)
+    if decoded_token == "Token expired":
+        return jsonify({"error": "Token expired"}), 401
+    elif decoded_token == "Invalid token":
+        return jsonify({"error": "Invalid token"}), 401
+
+    job = job_queue.get(job_id)
+    if job is None or job.pop("user_id") != str(decoded_token["user_id"]):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+
+# Job Progress Events Endpoint (Server-Sent Events)
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def JobEvents(job_id):
+    # EventSource cannot set headers, so the token may also come as ?token=
+    auth_token = request.headers.get("Authorization") or request.args.get("token")
+    if not auth_token:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    decoded_token = utils.verify_token(auth_token)
+    if decoded_token == "Token expired":
+        return jsonify({"error": "Token expired"}), 401
+    elif decoded_token == "Invalid token":
+        return jsonify({"error": "Invalid token"}), 401
+
+    job = job_queue.get(job_id)
+    if job is None or job["user_id"] != str(decoded_token["user_id"]):
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        last_progress = None
+        last_sent = time.monotonic()
+        while True:
+            job = job_queue.get(job_id)
+            if job["progress"] is not None and job["progress"] != last_progress:
+                last_progress = job["progress"]
+                last_sent = time.monotonic()
+                yield f"event: progress\ndata: {json.dumps(last_progress)}\n\n"
+
+            if job["status"] in ("done", "failed"):
+                job.pop("user_id")
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+                return
+
+            if time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"  # Stops proxies from closing an idle stream
+            time.sleep(SSE_POLL_SECONDS)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ================================================================== Retrieval APIs ====================================================================
@@ -781,7 +1167,7 @@ def retrieve_input_content():
         return jsonify({"error": "Invalid token"}), 401
 
     user_id = decoded_token["user_id"]
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     data = DaOPS.get_input_content(user_id=[user_id])
 
     if data is not None:
@@ -811,7 +1197,7 @@ def retrieve_processed_text():
     input_content_id = data.get("input_content_id", [])
     print(f"Input Content ID: {input_content_id} and its type is {type(input_content_id)}")
 
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     processed_text_data = DaOPS.get_processed_text(
         input_content_id=input_content_id,
     )
@@ -844,7 +1230,7 @@ def retrieve_processed_audio():
     data = request.get_json()
     input_content_id = data.get("input_content_id")
 
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     processed_audio_data = DaOPS.get_processed_audio(
         input_content_id=input_content_id,
     )
@@ -876,7 +1262,7 @@ def retrieve_processed_image():
     data = request.get_json()
     input_content_id = data.get("input_content_id")
 
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     processed_image_data = DaOPS.get_processed_image(
         input_content_id=input_content_id,
     )
@@ -908,7 +1294,7 @@ def retrieve_processed_video():
     data = request.get_json()
     input_content_id = data.get("input_content_id")
 
-    DaOPS = DatabaseOPS()
+    DaOPS = get_db()
     processed_video_data = DaOPS.get_processed_video(
         input_content_id=input_content_id,
     )
@@ -919,4 +1305,8 @@ def retrieve_processed_video():
         return jsonify({"error": "Internal server error"}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    debug = True
+    # The debug reloader runs this file twice; only its child (WERKZEUG_RUN_MAIN) serves
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        startup()
+    app.run(debug=debug, host="0.0.0.0", port=5000, threaded=True)
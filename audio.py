@@ -1,65 +1,200 @@
-from text import TextProfanityFilter
-from predict import ProfanityDetectionModel
-from faster_whisper import WhisperModel
+import time
+import wave
+
 from pydub import AudioSegment
 
+from chunking import CHUNKED_MIN_SECONDS, ChunkedTranscriber, probe_duration
+from masking import AudioMasker
+from progress import ProgressTracker
+from registry import whisper_registry
+
 
 class AudioProfanityFilter:
     def __init__(self, textpf):
-        self.textpf = textpf
-        self.tpf = TextProfanityFilter()  # Initializing badwords
-        self.pdm = ProfanityDetectionModel()  # Initializing ML model
+        self.textpf = textpf  # Shared TextProfanityFilter: bad words, lexicon and ML model
+
+    def moderate_segment(self, words: list, custom_words: list, mask_char="*") -> list:
+        """
+        Moderate the words of one transcribed segment.
+
+        Args:
+            words (list): (word, start, end) tuples of the segment
+            custom_words (list): Extra words to treat as profane
+            mask_char (str): Character used to mask profane words
+
+        Returns:
+            list: One entry per word with OriginalWord, IsProfane, FilteredWord, Start and End
+        """
+        moderated_json = []
+
+        # Convert leetspeak to normal text
+        words = [(self.textpf.convert_leetspeak(word), start, end) for word, start, end in words]
+
+        # Bad words and phrases spanning several transcribed words
+        lexicon_hits = self.textpf.lexicon.flagged_positions([word for word, _, _ in words])
+
+        # Classify the remaining words of the segment, using the shared verdict cache
+        candidates = list(
+            dict.fromkeys(
+                word
+                for position, (word, _, _) in enumerate(words)
+                if position not in lexicon_hits
+                and not self.textpf.isGoodWord(word.lower())
+            )
+        )
+        verdicts = self.textpf.classify_words(candidates)
+
+        for position, (word, start, end) in enumerate(words):
+            if position in lexicon_hits:
+                moderated_json.append(
+                    {
+                        "OriginalWord": word,
+                        "IsProfane": True,
+                        "FilteredWord": 4 * mask_char,
+                        "Start": start,
+                        "End": end,
+                    }
+                )
+            elif self.textpf.isGoodWord(word.lower()):
+                moderated_json.append(
+                    {
+                        "OriginalWord": word,
+                        "IsProfane": False,
+                        "FilteredWord": word,
+                        "Start": start,
+                        "End": end,
+                    }
+                )
+            # Check if word is profane using ML model or exists in bad words list
+            elif verdicts[word] or self.textpf.isBadWord(
+                word=word, custom_words=custom_words
+            ):
+                # If profane, mask the word and mark as profane
+                moderated_json.append(
+                    {
+                        "OriginalWord": word,
+                        "IsProfane": True,
+                        # "FilteredWord": len(word) * mask_char,
+                        "FilteredWord": 4 * mask_char,
+                        "Start": start,
+                        "End": end,
+                    }
+                )
+            else:
+                # If not profane, keep original word and mark as clean
+                moderated_json.append(
+                    {
+                        "OriginalWord": word,
+                        "IsProfane": False,
+                        "FilteredWord": word,
+                        "Start": start,
+                        "End": end,
+                    }
+                )
+        return moderated_json
 
     def transcribeAndModerate(
-        self, audio: str, custom_words: list, mask_char="*", model_size="tiny"
+        self,
+        audio: str,
+        custom_words: list,
+        mask_char="*",
+        model_size="tiny",
+        timings: dict | None = None,
+        progress: ProgressTracker | None = None,
     ) -> list:
         moderated_json = []
 
-        model = WhisperModel(model_size, device="cpu", compute_type="int8")
-
-        segments, _ = model.transcribe(audio=audio, word_timestamps=True)
-
-        for segment in segments:
-            for word in segment.words:
-                word.word = self.tpf.convert_leetspeak(word.word)  # Convert leetspeak to normal text
-                if self.textpf.isGoodWord(word.word.lower()):
-                    moderated_json.append(
-                        {
-                            "OriginalWord": word.word,
-                            "IsProfane": False,
-                            "FilteredWord": word.word,
-                            "Start": word.start,
-                            "End": word.end,
-                        }
-                    )
-                # Check if word is profane using ML model or exists in bad words list
-                elif self.textpf.predict_text(text=word.word) or self.textpf.isBadWord(
-                    word=word.word, custom_words=custom_words
-                ):
-                    # If profane, mask the word and mark as profane
-                    moderated_json.append(
-                        {
-                            "OriginalWord": word.word,
-                            "IsProfane": True,
-                            # "FilteredWord": len(word.word) * mask_char,
-                            "FilteredWord": 4 * mask_char,
-                            "Start": word.start,
-                            "End": word.end,
-                        }
-                    )
-                else:
-                    # If not profane, keep original word and mark as clean
-                    moderated_json.append(
-                        {
-                            "OriginalWord": word.word,
-                            "IsProfane": False,
-                            "FilteredWord": word.word,
-                            "Start": word.start,
-                            "End": word.end,
-                        }
-                    )
+        # Shared, preloaded model; segments are decoded lazily while we iterate
+        with whisper_registry.acquire(model_size, timings=timings) as model:
+            segments, info = model.transcribe(audio=audio, word_timestamps=True)
+            if progress:
+                progress.start("transcription", total=info.duration)
+
+            for segment in segments:
+                segment_json = self.moderate_segment(
+                    [(word.word, word.start, word.end) for word in segment.words],
+                    custom_words=custom_words,
+                    mask_char=mask_char,
+                )
+                moderated_json += segment_json
+                if progress:
+                    progress.add_flagged_words(segment_json)
+                    progress.update("transcription", segment.end)
+
+        if progress:
+            progress.finish("transcription")
         return moderated_json
 
+    def iterChunkedFilteration(
+        self,
+        audio_path: str,
+        output_file_name: str,
+        mask_char: str,
+        custom_words: list,
+        beep_path=None,
+        timings: dict | None = None,
+        progress: ProgressTracker | None = None,
+        duration: float | None = None,
+    ):
+        """
+        Transcribe, moderate and mask long audio chunk by chunk.
+
+        Chunks are transcribed concurrently by ChunkedTranscriber; as each one
+        comes back in order, its words are moderated, the matching part of the
+        original audio is masked and appended to the output WAV.
+
+        Yields:
+            list: The moderated words of each chunk, in file order
+        """
+        started = time.perf_counter()
+        beep = AudioSegment.from_file(beep_path) if beep_path else None
+        masker = AudioMasker(beep=beep)
+
+        if progress:
+            # Transcription and masking advance together, one chunk at a time
+            progress.start("transcription", total=duration)
+            progress.start("masking", total=duration)
+
+        chunks = 0
+        with wave.open("storage/files/" + output_file_name, "wb") as output:
+            for offset, length, segments in ChunkedTranscriber().transcribe(audio_path):
+                chunk_data = []
+                for words in segments:
+                    chunk_data += self.moderate_segment(words, custom_words, mask_char)
+
+                # Only this chunk of the original audio is decoded and masked
+                audio = AudioSegment.from_file(audio_path, start_second=offset, duration=length)
+                audio = masker.mask(
+                    audio,
+                    [
+                        (float(word["Start"]) - offset, float(word["End"]) - offset)
+                        for word in chunk_data
+                        if word["IsProfane"]
+                    ],
+                )
+                if chunks == 0:
+                    output.setnchannels(audio.channels)
+                    output.setsampwidth(audio.sample_width)
+                    output.setframerate(audio.frame_rate)
+                    if timings is not None:
+                        timings["first_chunk_seconds"] = round(time.perf_counter() - started, 3)
+                output.writeframes(audio.raw_data)
+                chunks += 1
+
+                if progress:
+                    progress.add_flagged_words(chunk_data)
+                    progress.update("transcription", offset + length)
+                    progress.update("masking", offset + length)
+
+                yield chunk_data
+
+        if progress:
+            progress.finish("transcription")
+            progress.finish("masking")
+        if timings is not None:
+            timings["chunks"] = chunks
+            timings["transcribe_seconds"] = round(time.perf_counter() - started, 3)
+
     # Run this function
     def audioProfanityFilteration(
         self,
@@ -68,40 +203,59 @@ class AudioProfanityFilter:
         mask_char: str,
         custom_words: list,
         beep_path=None,
+        timings: dict | None = None,
+        chunked: bool | None = None,
+        progress: ProgressTracker | None = None,
     ):
+        # Long files are streamed chunk by chunk with bounded memory
+        duration = None
+        if chunked is None:
+            duration = probe_duration(audio_path)
+            chunked = duration > CHUNKED_MIN_SECONDS
+        if chunked:
+            profanity_data = []
+            for chunk_data in self.iterChunkedFilteration(
+                audio_path=audio_path,
+                output_file_name=output_file_name,
+                mask_char=mask_char,
+                custom_words=custom_words,
+                beep_path=beep_path,
+                timings=timings,
+                progress=progress,
+                duration=duration,
+            ):
+                profanity_data += chunk_data
+            return output_file_name, profanity_data
+
         profanity_data = self.transcribeAndModerate(
-            audio=audio_path, custom_words=custom_words, mask_char=mask_char
+            audio=audio_path,
+            custom_words=custom_words,
+            mask_char=mask_char,
+            timings=timings,
+            progress=progress,
         )
+        if progress:
+            progress.start("masking", total=1)
+
         # Load the main audio
         audio = AudioSegment.from_file(audio_path)
 
-        # Create or load beep sound (default: 500ms tone)
-        if beep_path:
-            beep = AudioSegment.from_file(beep_path)
-        else:
-            # Generate 1000Hz beep for 500ms
-            from pydub.generators import Sine
-
-            beep = Sine(500).to_audio_segment(duration=500).apply_gain(-5)
-
-        for word in profanity_data:
-            if word["IsProfane"]:
-                start_ms = int(float(word["Start"]) * 1000)
-                end_ms = int(float(word["End"]) * 1000)
-                duration = end_ms - start_ms
-
-                # Resize beep to match duration
-                adjusted_beep = (
-                    beep[:duration]
-                    if len(beep) >= duration
-                    else beep * (duration // len(beep) + 1)
-                )
-                adjusted_beep = adjusted_beep[:duration]
+        # Custom beep sound, or the default 500Hz tone generated by the masker
+        beep = AudioSegment.from_file(beep_path) if beep_path else None
 
-                # Replace segment with beep
-                audio = audio[:start_ms] + adjusted_beep + audio[end_ms:]
+        # Beep every profane word in one pass over the samples
+        audio = AudioMasker(beep=beep).mask(
+            audio,
+            [
+                (float(word["Start"]), float(word["End"]))
+                for word in profanity_data
+                if word["IsProfane"]
+            ],
+        )
 
         # Export censored audio
         audio.export("storage/files/" + output_file_name, format="wav")
+        if progress:
+            progress.finish("masking")
 
         return output_file_name, profanity_data
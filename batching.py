@@ -0,0 +1,98 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Merges concurrent single-item requests into shared batches.
+
+    Callers submit one item and get a Future back. A background thread collects
+    items until max_batch_size is reached or the oldest item has waited
+    max_wait_ms, then runs the batch handler once for all of them. If the
+    handler fails, the items are retried one by one, so one bad input (e.g. an
+    undecodable image) only fails its own request.
+    """
+
+    def __init__(self, handler, max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        self.handler = handler  # Takes a list of items, returns a list of results
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+
+    def submit(self, item) -> Future:
+        """
+        Queue an item for the next batch.
+
+        Args:
+            item: One input for the batch handler
+
+        Returns:
+            Future: Resolves to the handler's result for this item
+        """
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, daemon=True)
+                self.worker.start()
+
+        future = Future()
+        self.queue.put((item, future))
+        return future
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            # Collect more items within the latency budget
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.handler(items)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    with self.lock:
+                        self.failed_batches += 1
+                    self.run_one_by_one(batch)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+
+            with self.lock:
+                self.batches += 1
+                self.items += len(batch)
+
+    def run_one_by_one(self, batch: list) -> None:
+        for item, future in batch:
+            try:
+                future.set_result(self.handler([item])[0])
+            except Exception as e:
+                future.set_exception(e)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "failed_batches": self.failed_batches,
+                "queued": self.queue.qsize(),
+            }
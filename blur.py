@@ -0,0 +1,68 @@
+import os
+
+from PIL import Image, ImageFilter
+
+BLUR_DOWNSCALE_RADIUS = float(os.getenv("BLUR_DOWNSCALE_RADIUS", 8))  # Larger radii blur a downscaled copy
+BLUR_TILE_SIZE = int(os.getenv("BLUR_TILE_SIZE", 1024))  # Larger images are blurred tile by tile
+
+
+def blurrable(image: Image.Image) -> Image.Image:
+    """Convert palette and other modes GaussianBlur cannot filter."""
+    if image.mode in ("RGB", "RGBA", "L", "LA"):
+        return image
+    return image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+
+def gaussian_blur(image: Image.Image, radius: float) -> Image.Image:
+    """
+    Full-resolution Gaussian blur. Images larger than BLUR_TILE_SIZE are blurred
+    in tiles, each with a margin wide enough that the seams do not show, so only
+    one tile is filtered in memory at a time.
+    """
+    image = blurrable(image)
+    if image.width <= BLUR_TILE_SIZE and image.height <= BLUR_TILE_SIZE:
+        return image.filter(ImageFilter.GaussianBlur(radius=radius))
+
+    margin = int(3 * radius) + 1  # GaussianBlur reads up to about 3 radii away
+    output = Image.new(image.mode, image.size)
+    for top in range(0, image.height, BLUR_TILE_SIZE):
+        for left in range(0, image.width, BLUR_TILE_SIZE):
+            right = min(left + BLUR_TILE_SIZE, image.width)
+            bottom = min(top + BLUR_TILE_SIZE, image.height)
+            padded = (
+                max(0, left - margin),
+                max(0, top - margin),
+                min(image.width, right + margin),
+                min(image.height, bottom + margin),
+            )
+            tile = image.crop(padded).filter(ImageFilter.GaussianBlur(radius=radius))
+            inner = (left - padded[0], top - padded[1], right - padded[0], bottom - padded[1])
+            output.paste(tile.crop(inner), (left, top))
+    return output
+
+
+def fast_blur(image: Image.Image, radius: float) -> Image.Image:
+    """
+    Gaussian blur whose cost does not grow with the radius.
+
+    For radius above BLUR_DOWNSCALE_RADIUS the image is downscaled so the blur
+    only needs BLUR_DOWNSCALE_RADIUS, blurred and scaled back up. Fine detail is
+    gone at such radii anyway, so the result looks the same as a full-resolution
+    blur at a fraction of the cost.
+
+    Args:
+        image (Image.Image): Image to blur
+        radius (float): Gaussian blur radius in pixels of the full image
+
+    Returns:
+        Image.Image: Blurred image of the same size
+    """
+    image = blurrable(image)
+    if radius <= BLUR_DOWNSCALE_RADIUS:
+        return gaussian_blur(image, radius)
+
+    scale = radius / BLUR_DOWNSCALE_RADIUS
+    small_size = (max(1, round(image.width / scale)), max(1, round(image.height / scale)))
+    small = image.resize(small_size, Image.Resampling.BOX)  # Averages every source pixel
+    blurred = gaussian_blur(small, BLUR_DOWNSCALE_RADIUS)
+    return blurred.resize(image.size, Image.Resampling.BILINEAR)
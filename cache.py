@@ -0,0 +1,121 @@
+import os
+import threading
+from collections import OrderedDict
+
+MODEL_PATH = "model/offensive_classifier.joblib"
+VECTORIZER_PATH = "model/tfidf_vectorizer.joblib"
+
+
+class VerdictCache:
+    """
+    Bounded, thread-safe LRU cache of per-token profanity verdicts.
+
+    Entries are tagged with a fingerprint of the model artifacts on disk; when an
+    artifact changes the cache is emptied and writes from filters still holding
+    the old model are dropped.
+    """
+
+    def __init__(self, maxsize: int = 50000, artifacts: tuple = (MODEL_PATH, VECTORIZER_PATH)):
+        self.maxsize = maxsize
+        self.artifacts = artifacts
+        self.entries = OrderedDict()  # normalized token -> verdict, oldest first
+        self.lock = threading.Lock()
+        self.fingerprint = self.artifact_fingerprint()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def artifact_fingerprint(self) -> tuple:
+        """Returns (path, mtime, size) for every artifact, None for missing files."""
+        fingerprint = []
+        for path in self.artifacts:
+            try:
+                stat = os.stat(path)
+                fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                fingerprint.append((path, None, None))
+        return tuple(fingerprint)
+
+    @staticmethod
+    def normalize(token: str) -> str:
+        return token.strip().lower()
+
+    def sync(self, fingerprint: tuple) -> None:
+        """Empty the cache if it holds verdicts from other artifacts than fingerprint."""
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self.entries.clear()
+                self.fingerprint = fingerprint
+                self.invalidations += 1
+
+    def get_many(self, tokens: list, fingerprint: tuple) -> dict:
+        """
+        Look up verdicts for many tokens under one lock acquisition.
+
+        Args:
+            tokens (list): Tokens to look up
+            fingerprint (tuple): Artifact fingerprint of the caller's model
+
+        Returns:
+            dict: token -> verdict for every cached token
+        """
+        found = {}
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self.misses += len(tokens)
+                return found
+
+            for token in tokens:
+                key = self.normalize(token)
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[token] = self.entries[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, verdicts: dict, fingerprint: tuple) -> None:
+        """
+        Store verdicts computed by a model loaded from fingerprint.
+
+        Args:
+            verdicts (dict): token -> verdict
+            fingerprint (tuple): Artifact fingerprint of the model that computed them
+        """
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                return  # Computed by a stale model
+
+            for token, verdict in verdicts.items():
+                key = self.normalize(token)
+                self.entries[key] = verdict
+                self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared by every TextProfanityFilter and AudioProfanityFilter in the process
+verdict_cache = VerdictCache(maxsize=int(os.getenv("VERDICT_CACHE_SIZE", 50000)))
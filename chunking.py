@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from registry import whisper_registry
+
+SAMPLE_RATE = 16000  # Whisper input rate
+CHUNKED_MIN_SECONDS = float(os.getenv("AUDIO_CHUNKED_MIN_SECONDS", 300))  # Longer files are chunked
+CHUNK_SECONDS = float(os.getenv("AUDIO_CHUNK_SECONDS", 60))  # Longest chunk sent to Whisper
+SEARCH_SECONDS = 5.0  # Tail of each chunk searched for the quietest cut point
+FRAME_SECONDS = 0.03  # Loudness is measured over frames of this length
+# Worker processes transcribing chunks, 0 transcribes inline (default on single core hosts)
+CPUS = os.cpu_count() or 1
+WORKERS = int(os.getenv("AUDIO_CHUNK_WORKERS", min(2, CPUS) if CPUS > 1 else 0))
+
+pools = {}  # Worker count -> pool
+pool_lock = threading.Lock()
+
+
+def get_pool(workers: int = WORKERS) -> ProcessPoolExecutor:
+    """Returns the process-wide transcription pool with that many workers, starting it on first use."""
+    with pool_lock:
+        if workers not in pools:
+            # Spawned, not forked: a forked copy of a loaded Whisper model can deadlock
+            pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return pools[workers]
+
+
+def transcribe_chunk(samples, model_size: str) -> list:
+    """
+    Transcribe one chunk; runs in a pool worker, which loads its own model once.
+
+    Returns:
+        list: One list of (word, start, end) tuples per segment, relative to the chunk start
+    """
+    with whisper_registry.acquire(model_size) as model:
+        segments, _ = model.transcribe(audio=samples, word_timestamps=True)
+        return [
+            [(word.word, word.start, word.end) for word in segment.words]
+            for segment in segments
+        ]
+
+
+def probe_duration(path: str) -> float:
+    """Returns the duration of a media file in seconds, 0.0 if ffprobe cannot read it."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path,
+    ]
+    try:
+        return float(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip())
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        print(f"ffprobe failed: {e}")
+        return 0.0
+
+
+def quietest_cut(samples) -> int:
+    """Index of the quietest frame in the last SEARCH_SECONDS of samples."""
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    search = samples[-int(SEARCH_SECONDS * SAMPLE_RATE):]
+    frames = len(search) // frame
+    if frames == 0:
+        return len(samples)
+
+    energy = (search[: frames * frame].astype(np.float32) ** 2).reshape(frames, frame).mean(axis=1)
+    quietest = int(energy.argmin())
+    return len(samples) - len(search) + quietest * frame + frame // 2
+
+
+def iter_chunks(audio_path: str, chunk_seconds: float = CHUNK_SECONDS):
+    """
+    Decode audio with ffmpeg as 16kHz mono and cut it into chunks at quiet points.
+
+    Only one chunk plus the carried-over tail is held in memory at a time.
+
+    Yields:
+        tuple: (offset_seconds, float32 samples in [-1, 1])
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", audio_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    window = int(chunk_seconds * SAMPLE_RATE)
+    offset = 0  # Samples before the current buffer
+    buffer = np.zeros(0, dtype=np.int16)
+    try:
+        while True:
+            data = process.stdout.read(2 * (window - len(buffer)))
+            if data:
+                buffer = np.concatenate([buffer, np.frombuffer(data, dtype=np.int16)])
+            if len(buffer) < window:
+                break  # End of stream
+
+            # Cut at the quietest point near the end, carry the rest over
+            cut = quietest_cut(buffer)
+            yield offset / SAMPLE_RATE, buffer[:cut].astype(np.float32) / 32768
+            offset += cut
+            buffer = buffer[cut:]
+
+        if len(buffer):
+            yield offset / SAMPLE_RATE, buffer.astype(np.float32) / 32768
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+class ChunkedTranscriber:
+    """
+    Transcribes long audio chunk by chunk.
+
+    Chunks are cut at quiet points so words are not split, transcribed
+    concurrently in worker processes and returned in order with timestamps
+    shifted to the position of the chunk in the file. At most a few chunks are
+    in flight, so memory stays bounded for hour-long recordings.
+    """
+
+    def __init__(self, model_size: str = "tiny", workers: int = WORKERS, chunk_seconds: float = CHUNK_SECONDS):
+        self.model_size = model_size
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self.max_in_flight = max(1, 2 * workers)
+
+    def transcribe(self, audio_path: str):
+        """
+        Transcribe an audio file chunk by chunk.
+
+        Args:
+            audio_path (str): Audio or video file readable by ffmpeg
+
+        Yields:
+            tuple: (offset_seconds, duration_seconds, segments) per chunk, in file order;
+                segments is a list of (word, start, end) lists with absolute timestamps
+        """
+        chunks = iter_chunks(audio_path, self.chunk_seconds)
+
+        if self.workers <= 0:
+            for offset, samples in chunks:
+                yield self.shift(offset, len(samples), transcribe_chunk(samples, self.model_size))
+            return
+
+        executor = get_pool(self.workers)
+        in_flight = deque()
+        for offset, samples in chunks:
+            in_flight.append((offset, len(samples), executor.submit(transcribe_chunk, samples, self.model_size)))
+            if len(in_flight) >= self.max_in_flight:
+                yield self.collect(in_flight.popleft())
+
+        while in_flight:
+            yield self.collect(in_flight.popleft())
+
+    def collect(self, item):
+        offset, length, future = item
+        return self.shift(offset, length, future.result())
+
+    @staticmethod
+    def shift(offset: float, length: int, segments: list) -> tuple:
+        """Move chunk-relative word timestamps to their position in the file."""
+        return (
+            offset,
+            length / SAMPLE_RATE,
+            [[(word, start + offset, end + offset) for word, start, end in segment] for segment in segments],
+        )
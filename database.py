@@ -1,4 +1,8 @@
+from contextlib import contextmanager
 from datetime import datetime
+import queue
+import threading
+import time
 import mysql.connector
 from dotenv import load_dotenv
 import os
@@ -8,23 +12,218 @@ import utils
 load_dotenv()
 
 
+def connect_mysql():
+    # Connect to the database
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+        charset='utf8mb4',
+        use_unicode=True
+    )
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable database connections.
+
+    Connections are opened lazily up to `size`, checked with a health check on
+    every checkout and rolled back on release so no transaction or read snapshot
+    leaks into the next request.
+    """
+
+    def __init__(self, connect=connect_mysql, size: int = 10, timeout: float = 10.0):
+        self.connect = connect  # Factory for new connections, e.g. sqlite3.connect in tests
+        self.size = size
+        self.timeout = timeout  # Seconds to wait for a free connection
+        self.idle = queue.LifoQueue()  # Most recently used first, so idle ones can age out
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.created = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.discarded = 0
+
+    def is_healthy(self, conn) -> bool:
+        try:
+            if hasattr(conn, "ping"):
+                conn.ping(reconnect=False)  # mysql-connector
+            else:
+                conn.execute("SELECT 1")  # sqlite3
+            return True
+        except Exception:
+            return False
+
+    def discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.created -= 1
+            self.discarded += 1
+
+    def acquire(self):
+        """
+        Check out a healthy connection, opening one if the pool is not full yet.
+
+        Raises:
+            TimeoutError: If no connection becomes free within the pool timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        with self.lock:
+            self.checkouts += 1
+
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    can_open = self.created < self.size
+                    if can_open:
+                        self.created += 1
+                    else:
+                        self.waits += 1
+
+                if can_open:
+                    try:
+                        conn = self.connect()
+                    except Exception:
+                        with self.lock:
+                            self.created -= 1
+                        raise
+                else:
+                    try:
+                        conn = self.idle.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        with self.lock:
+                            self.timeouts += 1
+                        raise TimeoutError(
+                            f"No database connection free after {self.timeout} seconds"
+                        )
+
+            if self.is_healthy(conn):
+                with self.lock:
+                    self.in_use += 1
+                return conn
+            self.discard(conn)  # Broken connection, try the next one
+
+    def release(self, conn) -> None:
+        with self.lock:
+            self.in_use -= 1
+        try:
+            conn.rollback()  # Drop uncommitted work and the read snapshot
+        except Exception:
+            self.discard(conn)
+            return
+        self.idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Scoped checkout: with pool.connection() as conn: ..."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "size": self.size,
+                "open": self.created,
+                "in_use": self.in_use,
+                "idle": self.idle.qsize(),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+            }
+
+
+pool = None  # Process-wide pool, created on first use
+pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = ConnectionPool(
+                size=int(os.getenv("DB_POOL_SIZE", 10)),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            )
+        return pool
+
+
 class DatabaseOPS:
 
-    def __init__(self) -> None:
-        # Connect to the database
-        self.conn = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            charset='utf8mb4',
-            use_unicode=True
-        )
+    def __init__(self, pool: ConnectionPool | None = None) -> None:
+        # Check out a connection from the process-wide pool
+        self.pool = pool or get_pool()
+        self.conn = self.pool.acquire()
         self.cursor = self.conn.cursor()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        # Safety net for callers that never call close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def close(self):
+        """
+        Returns the connection to the pool.
+        """
+        if self.conn is None:
+            return
         self.cursor.close()
-        self.conn.close()
+        self.pool.release(self.conn)
+        self.conn = None
+
+    def commit(self):
+        """
+        Commits the current transaction, used after writes made with commit=False.
+        """
+        try:
+            self.conn.commit()
+            return 1
+        except Exception as e:
+            print(f"Error in commit is: {e}")
+            return e
+
+    def rollback(self):
+        try:
+            self.conn.rollback()
+        except Exception as e:
+            print(f"Error in rollback is: {e}")
+
+    def executemany(self, query: str, rows: list, commit: bool):
+        """
+        Inserts many rows with a single executemany call (one multi-row INSERT).
+        """
+        if not rows:
+            return 1
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany(query, rows)
+            if commit:
+                self.conn.commit()
+            cursor.close()
+            return 1
+        except Exception as e:
+            self.rollback()
+            raise e
 
     # 👇🏻 Inserting data in users table 👇🏻
     def inserting_data_in_users(self, username: str, email: str, password: str):
@@ -131,6 +330,7 @@ class DatabaseOPS:
         mask_character: str,
         output_content: str,
         project_name: str,
+        commit: bool = True,
     ):
         try:
             cursor = self.conn.cursor()
@@ -146,7 +346,8 @@ class DatabaseOPS:
                     project_name,
                 ),
             )
-            self.conn.commit()
+            if commit:
+                self.conn.commit()
             # Get the last inserted id
             input_content_id = cursor.lastrowid
             cursor.close()
@@ -155,96 +356,85 @@ class DatabaseOPS:
             print(f"Error in inserting input content is: {e}")
             return e
 
-    def insert_processed_text(
-        self,
-        input_content_id: str,
-        original_word: str,
-        is_flagged: str,
-        filtered_word: str,
+    def insert_processed_text_bulk(
+        self, input_content_id: str, rows: list, commit: bool = True
     ):
+        """
+        Inserts all processed words of a text in one statement.
+
+        Args:
+            rows (list): (original_word, is_flagged, filtered_word) tuples
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
+            return self.executemany(
                 "INSERT INTO processed_text (input_content_id, original_word, is_flagged, filtered_word) VALUES (%s, %s, %s, %s)",
-                (input_content_id, original_word, is_flagged, filtered_word),
+                [(input_content_id, *row) for row in rows],
+                commit,
             )
-            self.conn.commit()
-            cursor.close()
-            return 1
         except Exception as e:
-            print(f"Error in inserting_processed_text is: {e}")
+            print(f"Error in insert_processed_text_bulk is: {e}")
             return e
 
-    def insert_custom_words(self, input_content_id: str, custom_word: str):
+    def insert_custom_words_bulk(
+        self, input_content_id: str, custom_words: list, commit: bool = True
+    ):
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
+            return self.executemany(
                 "INSERT INTO custom_words (input_content_id, custom_word) VALUES (%s, %s)",
-                (input_content_id, custom_word),
+                [(input_content_id, custom_word) for custom_word in custom_words],
+                commit,
             )
-            self.conn.commit()
-            cursor.close()
-            return 1
         except Exception as e:
-            print(f"Error in inserting custom words is: {e}")
+            print(f"Error in insert_custom_words_bulk is: {e}")
             return e
 
-    def insert_processed_audio(
-        self,
-        input_content_id: str,
-        start_time: str,
-        end_time: str,
-        is_flagged: str,
-        original_word: str,
-        filtered_word: str,
+    def insert_processed_audio_bulk(
+        self, input_content_id: str, rows: list, commit: bool = True
     ):
+        """
+        Inserts all transcribed words of an audio in one statement.
+
+        Args:
+            rows (list): (start_time, end_time, is_flagged, original_word, filtered_word) tuples
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
+            return self.executemany(
                 "INSERT INTO processed_audio (input_content_id, start_time, end_time, is_flagged, original_word, filtered_word) VALUES (%s, %s, %s, %s, %s, %s)",
-                (
-                    input_content_id,
-                    start_time,
-                    end_time,
-                    is_flagged,
-                    original_word,
-                    filtered_word,
-                ),
+                [(input_content_id, *row) for row in rows],
+                commit,
             )
-            self.conn.commit()
-            cursor.close()
-            return 1
         except Exception as e:
-            print(f"Error in inserting processed audio is: {e}")
+            print(f"Error in insert_processed_audio_bulk is: {e}")
             return e
 
-    def insert_processed_image(
-        self,
-        input_content_id: str,
-        detected_content: str,
-        is_flagged: str,
+    def insert_processed_image_bulk(
+        self, input_content_id: str, rows: list, commit: bool = True
     ):
+        """
+        Inserts all detected categories of an image in one statement.
+
+        Args:
+            rows (list): (detected_content, is_flagged) tuples
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
+            return self.executemany(
                 "INSERT INTO processed_image (input_content_id, detected_content, is_flagged) VALUES (%s, %s, %s)",
-                (input_content_id, detected_content, is_flagged),
+                [(input_content_id, *row) for row in rows],
+                commit,
             )
-            self.conn.commit()
-            cursor.close()
-            return 1
         except Exception as e:
-            print(f"Error in inserting processed image is: {e}")
+            print(f"Error in insert_processed_image_bulk is: {e}")
             return e
 
-    def insert_visual_content_features(self, input_content_id, blur_radius, fps):
+    def insert_visual_content_features(self, input_content_id, blur_radius, fps, commit: bool = True):
         try:
             cursor = self.conn.cursor()
             cursor.execute(
                 "INSERT INTO visual_content_features (input_content_id, blur_radius, fps) VALUES (%s, %s, %s)",
                 (input_content_id, blur_radius, fps),
             )
-            self.conn.commit()
+            if commit:
+                self.conn.commit()
             cursor.close()
             return 1
         except Exception as e:
@@ -252,7 +442,7 @@ class DatabaseOPS:
             return e
 
     def insert_processed_video(
-        self, input_content_id, start_second, end_second
+        self, input_content_id, start_second, end_second, commit: bool = True
     ):
         try:
             cursor = self.conn.cursor()
@@ -260,7 +450,8 @@ class DatabaseOPS:
                 "INSERT INTO processed_video (input_content_id, start_second, end_second) VALUES (%s, %s, %s)",
                 (input_content_id, start_second, end_second),
             )
-            self.conn.commit()
+            if commit:
+                self.conn.commit()
             inserted_id = cursor.lastrowid
             cursor.close()
             return inserted_id
@@ -268,18 +459,41 @@ class DatabaseOPS:
             print(f"Error in inserting processed_video_detection is: {e}")
             return e
 
-    def insert_video_content_detections(self, processed_video_id, detected_content):
+    def insert_video_content_detections_bulk(self, rows: list, commit: bool = True):
+        """
+        Inserts the detections of many video seconds in one statement.
+
+        Args:
+            rows (list): (processed_video_id, detected_content) tuples
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
+            return self.executemany(
                 "INSERT INTO video_content_detections (processed_video_id, detected_content) VALUES (%s, %s)",
-                (processed_video_id, detected_content),
+                rows,
+                commit,
+            )
+        except Exception as e:
+            print(f"Error in insert_video_content_detections_bulk is: {e}")
+            return e
+
+    def insert_detected_regions_bulk(
+        self, input_content_id: str, rows: list, commit: bool = True
+    ):
+        """
+        Inserts the blurred regions of an image or video in one statement.
+
+        Args:
+            rows (list): (start_second, end_second, box_left, box_top, box_right, box_bottom,
+                detected_content) tuples; the seconds are None for images
+        """
+        try:
+            return self.executemany(
+                "INSERT INTO detected_regions (input_content_id, start_second, end_second, box_left, box_top, box_right, box_bottom, detected_content) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                [(input_content_id, *row) for row in rows],
+                commit,
             )
-            self.conn.commit()
-            cursor.close()
-            return 1
         except Exception as e:
-            print(f"Error in inserting insert_video_content_detections is: {e}")
+            print(f"Error in insert_detected_regions_bulk is: {e}")
             return e
 
     # to present on dashboard
@@ -414,10 +628,23 @@ class DatabaseOPS:
                     print(f"Error in get_processed_video 3 is: {e}")
                     return None
 
+        try:
+            cursor = self.conn.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT start_second, end_second, box_left, box_top, box_right, box_bottom, detected_content FROM detected_regions WHERE input_content_id = %s",
+                (input_content_id,),
+            )
+            detected_regions = cursor.fetchall()
+            cursor.close()
+        except Exception as e:
+            print(f"Error in get_processed_video 4 is: {e}")
+            return None
+
         if len(processed_audio_data) > 0 or len(processed_video_data) > 0:
             return {
                 "processed_audio": processed_audio_data,
                 "processed_video": processed_video_data,
+                "detected_regions": detected_regions,
             }
         return None
     
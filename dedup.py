@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+BANDS = 8  # 64-bit hash split into 8 bytes; any hash within 7 bits shares a band
+# Flat, dark or smooth thumbnails all hash close to 0 (or all ones) and are never cached
+MIN_CONTRAST = float(os.getenv("PHASH_MIN_CONTRAST", 8))  # Std. dev. of the thumbnail's gray levels
+MIN_BITS = 8  # Fewest set (and unset) bits of a hash worth caching
+
+
+def dhash(image: Image.Image) -> int | None:
+    """
+    64-bit difference hash: each bit says whether a pixel of a 9x8 grayscale
+    thumbnail is brighter than its right neighbour. Re-encoding, resizing and
+    small edits change only a few bits.
+
+    Returns None for low-contrast images (below MIN_CONTRAST, or fewer than
+    MIN_BITS set or unset bits): their hashes are near-identical whatever they
+    show, e.g. any two dark frames, so they must not share a verdict.
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.Resampling.BILINEAR).getdata())
+    mean = sum(pixels) / len(pixels)
+    if (sum((pixel - mean) ** 2 for pixel in pixels) / len(pixels)) ** 0.5 < MIN_CONTRAST:
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    if not MIN_BITS <= value.bit_count() <= 64 - MIN_BITS:
+        return None
+    return value
+
+
+def bands(value: int) -> list:
+    return [(value >> (8 * i)) & 0xFF for i in range(BANDS)]
+
+
+class PerceptualHashCache:
+    """
+    Verdict cache for near-duplicate images, looked up by Hamming distance
+    between dHashes.
+
+    The in-memory tier is a bounded LRU with a band index, so a lookup only
+    compares against hashes that share at least one byte. The optional on-disk
+    tier is a SQLite file that survives restarts; its hits are promoted to
+    memory. Entries are scoped by a namespace (model, prompts, threshold) so
+    verdicts of a different configuration are never returned.
+    """
+
+    def __init__(self, maxsize: int = 10000, max_distance: int = 6, db_path: str | None = None):
+        self.maxsize = maxsize
+        self.max_distance = min(max_distance, BANDS - 1)  # Band lookup is exact up to 7 bits
+        self.entries = OrderedDict()  # (namespace, hash) -> verdict, oldest first
+        self.index = {}  # (namespace, band, byte) -> set of hashes
+        self.lock = threading.Lock()
+
+        self.db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            columns = ", ".join(f"b{i} INTEGER" for i in range(BANDS))
+            self.db.execute(
+                f"CREATE TABLE IF NOT EXISTS phash (namespace TEXT, hash TEXT, {columns}, "
+                "verdict TEXT, PRIMARY KEY (namespace, hash))"
+            )
+            for i in range(BANDS):
+                self.db.execute(f"CREATE INDEX IF NOT EXISTS phash_b{i} ON phash (namespace, b{i})")
+            self.db.commit()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0  # Lookups of low-contrast images, always analyzed
+
+    def lookup_memory(self, namespace: str, value: int):
+        candidates = set()
+        for band, byte in enumerate(bands(value)):
+            candidates |= self.index.get((namespace, band, byte), set())
+
+        best, best_distance = None, self.max_distance + 1
+        for candidate in candidates:
+            distance = (candidate ^ value).bit_count()
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        if best is None:
+            return None
+        self.entries.move_to_end((namespace, best))
+        return self.entries[(namespace, best)]
+
+    def lookup_disk(self, namespace: str, value: int):
+        where = " OR ".join(f"b{i} = ?" for i in range(BANDS))
+        rows = self.db.execute(
+            f"SELECT hash, verdict FROM phash WHERE namespace = ? AND ({where})",
+            (namespace, *bands(value)),
+        ).fetchall()
+
+        best, best_distance = None, self.max_distance + 1
+        for stored, verdict in rows:
+            distance = (int(stored, 16) ^ value).bit_count()
+            if distance < best_distance:
+                best, best_distance = (int(stored, 16), json.loads(verdict)), distance
+        return best
+
+    def get(self, namespace: str, value: int):
+        """
+        Find the verdict of a stored image within max_distance bits of value.
+
+        Args:
+            namespace (str): Configuration the verdict must come from
+            value (int | None): dHash of the image, None if it has no usable hash
+
+        Returns:
+            dict | None: A copy of the cached verdict, None on a miss
+        """
+        with self.lock:
+            if value is None:
+                self.uncacheable += 1
+                return None
+
+            verdict = self.lookup_memory(namespace, value)
+            if verdict is None and self.db is not None:
+                found = self.lookup_disk(namespace, value)
+                if found is not None:
+                    self.remember(namespace, *found)
+                    verdict = found[1]
+                    self.disk_hits += 1
+
+            if verdict is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {**verdict, "harmful_detected": list(verdict["harmful_detected"])}
+
+    def remember(self, namespace: str, value: int, verdict: dict) -> None:
+        key = (namespace, value)
+        if key not in self.entries:
+            for band, byte in enumerate(bands(value)):
+                self.index.setdefault((namespace, band, byte), set()).add(value)
+        self.entries[key] = verdict
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            (old_namespace, old_value), _ = self.entries.popitem(last=False)
+            for band, byte in enumerate(bands(old_value)):
+                hashes = self.index[(old_namespace, band, byte)]
+                hashes.discard(old_value)
+                if not hashes:
+                    del self.index[(old_namespace, band, byte)]
+            self.evictions += 1
+
+    def put_many(self, namespace: str, verdicts: dict) -> None:
+        """
+        Store freshly computed verdicts in both tiers.
+
+        Args:
+            namespace (str): Configuration the verdicts come from
+            verdicts (dict): dHash -> verdict; None hashes are skipped
+        """
+        verdicts = {value: verdict for value, verdict in verdicts.items() if value is not None}
+        with self.lock:
+            for value, verdict in verdicts.items():
+                self.remember(namespace, value, verdict)
+
+            if self.db is not None and verdicts:
+                self.db.executemany(
+                    f"INSERT OR REPLACE INTO phash VALUES (?, ?, {', '.join('?' * (BANDS + 1))})",
+                    [
+                        (namespace, f"{value:016x}", *bands(value), json.dumps(verdict))
+                        for value, verdict in verdicts.items()
+                    ],
+                )
+                self.db.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "max_distance": self.max_distance,
+                "disk": self.db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "uncacheable": self.uncacheable,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared by every ImageProfanityFilter in the process
+image_cache = PerceptualHashCache(
+    maxsize=int(os.getenv("PHASH_CACHE_SIZE", 10000)),
+    max_distance=int(os.getenv("PHASH_MAX_DISTANCE", 6)),
+    db_path=os.getenv("PHASH_DB") or None,
+)
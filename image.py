@@ -1,12 +1,30 @@
-import time
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import clip
-from PIL import Image, ImageFilter
+from PIL import Image
+
+import utils
+from blur import blurrable, fast_blur
+from dedup import dhash, image_cache
+from regions import REGION_GRID, cell_regions, grid_windows
+
+CACHE_DIR = "storage/cache"  # Persisted text embeddings
+PREPROCESS_WORKERS = int(os.getenv("CLIP_PREPROCESS_WORKERS", 4))  # Parallel decode/resize
+# torch intra-op threads on CPU: half of the cores, Whisper gets the other half (WHISPER_CPU_THREADS)
+CLIP_CPU_THREADS = int(os.getenv("CLIP_CPU_THREADS", max(1, (os.cpu_count() or 1) // 2)))
 
 
 class ImageProfanityFilter:
     def __init__(self, model_name="ViT-B/32", device=None, threshold=0.3):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        if self.device == "cpu" and CLIP_CPU_THREADS > 0:
+            torch.set_num_threads(CLIP_CPU_THREADS)  # Process-wide; leaves cores to the audio branch
+        self.model_name = model_name
+        self.preprocess_pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS)
         self.model, self.preprocess = clip.load(model_name, device=self.device)
         self.threshold = threshold
 
@@ -28,33 +46,208 @@ class ImageProfanityFilter:
 
         self.text_tokens = clip.tokenize(self.harmful_categories).to(self.device)
 
-    def blur_image(self, input_path, blur_radius=10):
+        # Normalized category embeddings, computed once and reused for every image
+        self.text_features = self.load_text_features()
+
+        # Perceptual hash cache scope: verdicts depend on the model, prompts and threshold
+        self.cache_namespace = hashlib.sha256(
+            json.dumps([self.model_name, self.harmful_categories, self.threshold]).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def load_text_features(self):
+        """
+        Load the normalized text embeddings of harmful_categories from disk, or
+        compute and persist them. The cache file is keyed by model name, device,
+        dtype and prompt list, so changing any of them recomputes the embeddings.
+        """
+        key = hashlib.sha256(
+            json.dumps(
+                [self.model_name, self.device, str(self.model.dtype), self.harmful_categories]
+            ).encode("utf-8")
+        ).hexdigest()[:16]
+        cache_path = os.path.join(CACHE_DIR, f"clip_text_{key}.pt")
+
+        if os.path.exists(cache_path):
+            try:
+                return torch.load(cache_path, map_location=self.device)
+            except Exception as e:
+                print(f"Error loading cached text embeddings: {e}")
+
+        with torch.no_grad():
+            text_features = self.model.encode_text(self.text_tokens)
+            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            torch.save(text_features.cpu(), cache_path)
+        except OSError as e:
+            print(f"Error saving text embeddings: {e}")
+
+        return text_features
+
+    def blur_image(self, input_path, blur_radius=10, regions=None, flagged=True):
+        """
+        Blur an image, or only its regions, and save it in storage/files.
+
+        Clean images (flagged False) and blur_radius 0 are not decoded at all;
+        the output is a copy of the input. Large radii and large images go
+        through fast_blur(), which downscales and tiles instead of running a
+        full-resolution blur.
+
+        Returns:
+            str: Output file name, unique per call
+        """
+        if not flagged or blur_radius <= 0:
+            output_path = utils.unique_filename(os.path.splitext(input_path)[1] or ".jpg")
+            # A copy, not a link: uploads are rewritten in place when the same name is uploaded again
+            shutil.copyfile(input_path, "storage/files/" + output_path)
+            return output_path
+
         # Open the input image
-        image = Image.open(input_path)
+        image = blurrable(Image.open(input_path))
 
-        # Apply Gaussian blur
-        blurred_image = image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+        if regions:
+            # Blur only the detected regions; each is blurred with a margin so its edges blend in
+            blurred_image = image.copy()
+            margin = 2 * blur_radius
+            for region in regions:
+                left, top, right, bottom = region["box"]
+                padded = (
+                    max(0, left - margin),
+                    max(0, top - margin),
+                    min(image.width, right + margin),
+                    min(image.height, bottom + margin),
+                )
+                patch = fast_blur(image.crop(padded), blur_radius)
+                inner = (left - padded[0], top - padded[1], right - padded[0], bottom - padded[1])
+                blurred_image.paste(patch.crop(inner), (left, top))
+        else:
+            blurred_image = fast_blur(image, blur_radius)
 
         # Convert to RGB if needed (JPEG does not support alpha channel)
         if blurred_image.mode in ("RGBA", "LA"):
             blurred_image = blurred_image.convert("RGB")
 
         # Save the output
-        output_path = f"{int(time.time())}.jpg"
+        output_path = utils.unique_filename("jpg")
         blurred_image.save("storage/files/" + output_path)
 
         return output_path
 
-    def detect(self, image_path: str):
-        # print("Started detection...")
-        image = self.preprocess(Image.open(image_path)).unsqueeze(0).to(self.device)
+    def load_image(self, source) -> Image.Image:
+        """
+        Open an image given as a file path, PIL image or RGB NumPy array.
+        """
+        if isinstance(source, Image.Image):
+            return source
+        if isinstance(source, str):
+            return Image.open(source)
+        return Image.fromarray(source)
+
+    def detect(self, image_path):
+        return self.detect_batch([image_path])[0]
+
+    def detect_batch(self, images: list) -> list:
+        """
+        Detect harmful content in many images with a single CLIP forward pass.
+
+        Args:
+            images (list): File paths, PIL images or RGB NumPy arrays
+
+        Returns:
+            list: One detect() result per image, in input order
+        """
+        if not images:
+            return []
+
+        # Decode and hash in parallel; near-duplicates of earlier images reuse their verdict
+        loaded = list(self.preprocess_pool.map(self.load_image, images))
+        hashes = list(self.preprocess_pool.map(dhash, loaded))
+        results = [image_cache.get(self.cache_namespace, value) for value in hashes]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+
+        probs = self.score([loaded[i] for i in misses])
+
+        computed = {}
+        for i, image_probs in zip(misses, probs):
+            results[i] = self.verdict(image_probs)
+            computed[hashes[i]] = {**results[i], "harmful_detected": list(results[i]["harmful_detected"])}
+        image_cache.put_many(self.cache_namespace, computed)
+        return results
+
+    def score(self, images: list):
+        """
+        Category probabilities of PIL images, in one CLIP forward pass.
+
+        Returns:
+            numpy.ndarray: One row of len(harmful_categories) probabilities per image
+        """
+        # Preprocess in parallel, then stack into one batch tensor
+        tensors = list(self.preprocess_pool.map(self.preprocess, images))
+        batch = torch.stack(tensors).to(self.device)
 
         with torch.no_grad():
-            self.model.encode_image(image)
-            self.model.encode_text(self.text_tokens)
-            logits_per_image, _ = self.model(image, self.text_tokens)
-            probs = logits_per_image.softmax(dim=-1).cpu().numpy().flatten()
+            # Same scoring as CLIP's forward pass, with the text side precomputed
+            image_features = self.model.encode_image(batch)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            logits_per_image = (
+                self.model.logit_scale.exp() * image_features @ self.text_features.t()
+            )
+            return logits_per_image.softmax(dim=-1).cpu().numpy()
+
+    def localize_batch(self, images: list, results: list, grid: int = REGION_GRID) -> list:
+        """
+        Find where the harmful content of flagged images is.
+
+        Every flagged image is cut into grid_windows() patches and all patches of
+        all images are scored in a single CLIP pass. Cells covered by a patch that
+        shows one of the image's detected categories are merged into regions; if
+        no patch does (the content spans the image), the whole image is one region.
+
+        Args:
+            images (list): File paths, PIL images or RGB NumPy arrays
+            results (list): detect_batch() results of the same images
+
+        Returns:
+            list: Regions (see cell_regions()) per image, [] for clean images
+        """
+        regions = [[] for _ in images]
+        flagged = [i for i, result in enumerate(results) if result["isFlagged"]]
+        if not flagged:
+            return regions
+
+        loaded = {i: self.load_image(images[i]).convert("RGB") for i in flagged}
+        patches, owners = [], []
+        for i in flagged:
+            for box, cells in grid_windows(loaded[i].width, loaded[i].height, grid):
+                patches.append(loaded[i].crop(box))
+                owners.append((i, cells))
+        probs = self.score(patches)
+
+        hot = {i: {} for i in flagged}  # Flagged cells per image, with their categories
+        for (i, cells), patch_probs in zip(owners, probs):
+            categories = [
+                label
+                for label, prob in zip(self.harmful_categories, patch_probs)
+                if prob > self.threshold and label in results[i]["harmful_detected"]
+            ]
+            if not categories:
+                continue
+            for cell in cells:
+                for category in categories:
+                    if category not in hot[i].setdefault(cell, []):
+                        hot[i][cell].append(category)
+
+        for i in flagged:
+            width, height = loaded[i].width, loaded[i].height
+            regions[i] = cell_regions(hot[i], width, height, grid) or [
+                {"box": [0, 0, width, height], "harmful_detected": list(results[i]["harmful_detected"])}
+            ]
+        return regions
 
+    def verdict(self, probs) -> dict:
         results = list(zip(self.harmful_categories, probs))
         harmful = [label for label, prob in results if prob > self.threshold]
 
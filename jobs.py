@@ -0,0 +1,215 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+JOBS_DB = os.getenv("JOBS_DB", "storage/jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))  # Heavy jobs running at once on this node
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 32))  # Queued + running jobs before submit is refused
+HEARTBEAT_SECONDS = 10.0  # Running jobs are touched this often by the process running them
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when the node already has JOB_MAX_PENDING jobs."""
+
+
+class JobQueue:
+    """
+    Runs heavy moderation jobs in background worker threads.
+
+    Jobs are persisted in SQLite, so their status and result can be polled by
+    id from any request. Only `workers` jobs run at the same time and submit()
+    refuses new jobs once max_pending are queued or running. A job is claimed
+    atomically, so it runs once even if several processes share the database.
+    Jobs still queued when the process stopped are picked up again on start;
+    running jobs whose process stopped sending heartbeats are marked failed.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.handlers = {}  # kind -> function(params, job_id) returning (result, status code)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.pending = 0
+        self.owner = uuid.uuid4().hex  # Marks the jobs this process is running
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT, user_id TEXT, status TEXT, "
+            "params TEXT, progress TEXT, result TEXT, status_code INTEGER, error TEXT, "
+            "created REAL, started REAL, finished REAL)"
+        )
+        for column in ("owner TEXT", "heartbeat REAL"):
+            try:
+                self.db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass  # Column exists
+        self.db.commit()
+
+    def register(self, kind: str, handler) -> None:
+        self.handlers[kind] = handler
+
+    def execute(self, query: str, args: tuple = ()) -> list:
+        with self.lock:
+            rows = self.db.execute(query, args).fetchall()
+            self.db.commit()
+            return rows
+
+    def start(self) -> None:
+        """Start the worker threads and requeue jobs left over from a previous run."""
+        # Jobs of processes still alive keep their heartbeat fresh
+        self.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Interrupted by a restart', finished = ? "
+            "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+            (time.time(), time.time() - 3 * HEARTBEAT_SECONDS),
+        )
+        for (job_id,) in self.execute("SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created"):
+            with self.lock:
+                self.pending += 1
+            self.queue.put(job_id)
+
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self.run, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        threading.Thread(target=self.heartbeat, daemon=True).start()
+
+    def heartbeat(self) -> None:
+        while True:
+            self.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND owner = ?",
+                (time.time(), self.owner),
+            )
+            time.sleep(HEARTBEAT_SECONDS)
+
+    def claim(self, job_id: str) -> bool:
+        """Mark a queued job running; False if it is gone or another worker took it first."""
+        now = time.time()
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET status = 'running', started = ?, owner = ?, heartbeat = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (now, self.owner, now, job_id),
+            )
+            self.db.commit()
+            return cursor.rowcount == 1
+
+    def submit(self, kind: str, params: dict, user_id=None) -> str:
+        """
+        Queue a job.
+
+        Args:
+            kind (str): Registered handler name, e.g. "AUDIO"
+            params (dict): JSON-serializable arguments for the handler
+            user_id: Owner of the job, checked when it is polled
+
+        Returns:
+            str | None: The job id, None if the job could not be stored
+
+        Raises:
+            QueueFull: If max_pending jobs are already queued or running
+        """
+        # The slot is taken before the INSERT so concurrent submits cannot overshoot max_pending
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise QueueFull(f"{self.pending} jobs pending")
+            self.pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            self.execute(
+                "INSERT INTO jobs (job_id, kind, user_id, status, params, created) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, str(user_id), json.dumps(params), time.time()),
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Error queueing job: {e}")
+            with self.lock:
+                self.pending -= 1  # Give the slot back
+            return None
+        self.queue.put(job_id)
+        return job_id
+
+    def run(self) -> None:
+        while True:
+            job_id = self.queue.get()
+            if not self.claim(job_id):
+                with self.lock:
+                    self.pending -= 1
+                continue
+            kind, params = self.execute("SELECT kind, params FROM jobs WHERE job_id = ?", (job_id,))[0]
+
+            try:
+                result, status_code = self.handlers[kind](json.loads(params), job_id)
+                self.execute(
+                    "UPDATE jobs SET status = ?, result = ?, status_code = ?, finished = ? WHERE job_id = ?",
+                    (
+                        "done" if status_code < 400 else "failed",
+                        json.dumps(result, default=str),
+                        status_code,
+                        time.time(),
+                        job_id,
+                    ),
+                )
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, status_code = 500, finished = ? WHERE job_id = ?",
+                    (str(e), time.time(), job_id),
+                )
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+    def set_progress(self, job_id: str, progress: dict) -> None:
+        self.execute(
+            "UPDATE jobs SET progress = ? WHERE job_id = ?",
+            (json.dumps(progress, default=str), job_id),
+        )
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        Returns:
+            dict | None: Status, progress and (once finished) result of a job, None if unknown
+        """
+        rows = self.execute(
+            "SELECT kind, user_id, status, progress, result, status_code, error, created, started, finished "
+            "FROM jobs WHERE job_id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        kind, user_id, status, progress, result, status_code, error, created, started, finished = rows[0]
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "user_id": user_id,
+            "status": status,
+            "progress": json.loads(progress) if progress else None,
+            "result": json.loads(result) if result else None,
+            "status_code": status_code,
+            "error": error,
+            "created": created,
+            "started": started,
+            "finished": finished,
+        }
+
+    def stats(self) -> dict:
+        counts = dict(self.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "queued": counts.get("queued", 0),
+                "running": counts.get("running", 0),
+                "done": counts.get("done", 0),
+                "failed": counts.get("failed", 0),
+            }
@@ -0,0 +1,88 @@
+import string
+
+
+class LexiconMatcher:
+    """
+    Compiled word list matcher.
+
+    Single-token entries are kept in a hashed set and multi-word entries
+    (e.g. "blue waffle") in a token trie, so a lookup costs O(1) per token and
+    a scan costs O(tokens x longest phrase) no matter how big the word list is.
+    """
+
+    PUNCTUATION = string.punctuation + "\"'“”‘’"
+
+    def __init__(self, words: list, normalize=None) -> None:
+        self.normalize = normalize or str.lower  # Applied to entries and raw lookups
+        self.words = set()  # Single-token entries
+        self.phrases = {}  # Trie of multi-token entries, None key marks an entry end
+        self.max_phrase_length = 1
+
+        for entry in words:
+            self.add(entry)
+
+    def add(self, entry: str) -> None:
+        """
+        Compile a single entry into the matcher.
+
+        Args:
+            entry (str): Word or whitespace separated phrase to add
+        """
+        tokens = [self.clean(token) for token in self.normalize(entry).split()]
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            return
+
+        if len(tokens) == 1:
+            self.words.add(tokens[0])
+            return
+
+        node = self.phrases
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[None] = " ".join(tokens)
+        self.max_phrase_length = max(self.max_phrase_length, len(tokens))
+
+    def clean(self, token: str) -> str:
+        """Strips surrounding whitespace and punctuation from an already normalized token."""
+        return token.strip().strip(self.PUNCTUATION)
+
+    def __contains__(self, word: str) -> bool:
+        return self.clean(self.normalize(word)) in self.words
+
+    def find(self, tokens: list) -> list:
+        """
+        Find every lexicon hit in a list of normalized tokens in a single pass.
+
+        Args:
+            tokens (list): Tokens of the normalized text (e.g. normal_text.split())
+
+        Returns:
+            list: (start, end, entry) tuples, where tokens[start:end] matched entry
+        """
+        keys = [self.clean(token) for token in tokens]
+        hits = []
+
+        for start, key in enumerate(keys):
+            if key in self.words:
+                hits.append((start, start + 1, key))
+
+            # Walk the phrase trie from this token
+            node = self.phrases.get(key)
+            end = start + 1
+            while node is not None:
+                if None in node:
+                    hits.append((start, end, node[None]))
+                if end >= len(keys):
+                    break
+                node = node.get(keys[end])
+                end += 1
+
+        return hits
+
+    def flagged_positions(self, tokens: list) -> set:
+        """Returns the indexes of all tokens covered by a lexicon hit."""
+        positions = set()
+        for start, end, _ in self.find(tokens):
+            positions.update(range(start, end))
+        return positions
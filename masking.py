@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+from pydub import AudioSegment
+
+MASK_MODE = os.getenv("AUDIO_MASK_MODE", "beep")  # "beep" or "mute"
+CROSSFADE_MS = float(os.getenv("AUDIO_CROSSFADE_MS", 5))  # Fade in/out of each masked region
+BEEP_FREQUENCY = 500  # Hz, same tone as the old pydub Sine beep
+BEEP_GAIN_DB = -5
+
+
+class AudioMasker:
+    """
+    Masks many time regions of an AudioSegment in one pass over its samples.
+
+    The audio is turned into a NumPy array once; every region is overwritten in
+    place with a beep (or silence), cross-faded at its edges to avoid clicks,
+    and the array is turned back into a single AudioSegment. The cost grows with
+    the masked duration instead of words x file length.
+    """
+
+    def __init__(
+        self,
+        mode: str = MASK_MODE,
+        crossfade_ms: float = CROSSFADE_MS,
+        beep: AudioSegment | None = None,
+    ):
+        self.mode = mode
+        self.crossfade_ms = crossfade_ms
+        self.beep = beep  # Custom beep sound, a sine tone if None
+
+    @staticmethod
+    def merge(regions: list) -> list:
+        """Sort (start, end) regions and merge the ones that overlap."""
+        merged = []
+        for start, end in sorted(regions):
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    def custom_beep(self, audio: AudioSegment):
+        """Returns the custom beep as float samples in the format of audio, None if unset."""
+        if self.beep is None:
+            return None
+        beep = (
+            self.beep.set_frame_rate(audio.frame_rate)
+            .set_channels(audio.channels)
+            .set_sample_width(audio.sample_width)
+        )
+        return np.array(beep.get_array_of_samples(), dtype=np.float32).reshape(-1, audio.channels)
+
+    def mask_samples(self, audio: AudioSegment, length: int, custom, full_scale: float):
+        """Returns length x channels float samples of the mask sound."""
+        if self.mode == "mute":
+            return np.zeros((length, audio.channels), dtype=np.float32)
+        if custom is not None:
+            return np.resize(custom, (length, audio.channels))  # Repeat the sound to cover the region
+
+        t = np.arange(length, dtype=np.float32) / audio.frame_rate
+        amplitude = full_scale * 10 ** (BEEP_GAIN_DB / 20)
+        tone = amplitude * np.sin(2 * np.pi * BEEP_FREQUENCY * t)
+        return np.repeat(tone[:, None], audio.channels, axis=1)
+
+    def mask(self, audio: AudioSegment, regions: list) -> AudioSegment:
+        """
+        Replace regions of the audio with the mask sound.
+
+        Args:
+            audio (AudioSegment): Audio to mask
+            regions (list): (start_seconds, end_seconds) pairs, in any order
+
+        Returns:
+            AudioSegment: The masked audio, same length and format as the input
+        """
+        regions = self.merge(regions)
+        if not regions:
+            return audio
+
+        if audio.sample_width == 3:
+            audio = audio.set_sample_width(4)  # pydub exposes 24-bit samples as 32-bit values
+
+        samples = np.array(audio.get_array_of_samples()).reshape(-1, audio.channels)
+        info = np.iinfo(samples.dtype)
+        full_scale = float(info.max)
+        fade = int(self.crossfade_ms * audio.frame_rate / 1000)
+        custom = self.custom_beep(audio)
+
+        for start, end in regions:
+            first = max(0, int(start * audio.frame_rate))
+            last = min(len(samples), int(end * audio.frame_rate))
+            length = last - first
+            if length <= 0:
+                continue
+
+            mask = self.mask_samples(audio, length, custom, full_scale)
+
+            # Cross-fade from the original into the mask and back out
+            ramp = min(fade, length // 2)
+            if ramp > 0:
+                original = samples[first:last].astype(np.float32)
+                weight = np.ones(length, dtype=np.float32)
+                weight[:ramp] = np.linspace(0, 1, ramp, endpoint=False)
+                weight[-ramp:] = np.linspace(1, 0, ramp, endpoint=False)
+                mask = original + (mask - original) * weight[:, None]
+
+            samples[first:last] = np.clip(mask, info.min, info.max).astype(samples.dtype)
+
+        return audio._spawn(samples.tobytes())
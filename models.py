@@ -0,0 +1,19 @@
+from audio import AudioProfanityFilter
+from image import ImageProfanityFilter
+from registry import model_registry
+from text import TextProfanityFilter
+
+
+def get_text_filter() -> TextProfanityFilter:
+    """Returns the process-wide TextProfanityFilter."""
+    return model_registry.get("text_filter", TextProfanityFilter)
+
+
+def get_image_filter() -> ImageProfanityFilter:
+    """Returns the process-wide ImageProfanityFilter (CLIP is loaded once)."""
+    return model_registry.get("image_filter", ImageProfanityFilter)
+
+
+def get_audio_filter() -> AudioProfanityFilter:
+    """Returns the process-wide AudioProfanityFilter, built on the shared text filter."""
+    return model_registry.get("audio_filter", lambda: AudioProfanityFilter(textpf=get_text_filter()))
@@ -1,11 +1,19 @@
 import joblib
 
+from cache import MODEL_PATH, VECTORIZER_PATH, verdict_cache
+from registry import model_registry
+
 
 class ProfanityDetectionModel:
     def __init__(self) -> None:
-        # Load the saved model and vectorizer
-        self.model = joblib.load("model/offensive_classifier.joblib")
-        self.vectorizer = joblib.load("model/tfidf_vectorizer.joblib")
+        # Shared model and vectorizer, deserialized once per process
+        model_version, vectorizer_version = verdict_cache.artifact_fingerprint()
+        self.model = model_registry.get(
+            "offensive_classifier", lambda: joblib.load(MODEL_PATH), version=model_version
+        )
+        self.vectorizer = model_registry.get(
+            "tfidf_vectorizer", lambda: joblib.load(VECTORIZER_PATH), version=vectorizer_version
+        )
 
     def __str__(self) -> str:
         pass
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import deque
+
+PROGRESS_FLAGGED_LIMIT = int(os.getenv("PROGRESS_FLAGGED_LIMIT", 100))  # Latest flagged seconds/words kept per snapshot
+
+# Stages reported by each pipeline, in order
+AUDIO_STAGES = ["transcription", "masking"]
+VIDEO_STAGES = ["extract_audio", "transcription", "masking", "frame_detection", "mux"]
+
+
+class ProgressTracker:
+    """
+    Stage-by-stage progress of one moderation run.
+
+    Each stage counts completed out of total units (seconds of audio, seconds of
+    video, ...) and estimates its remaining time from its own rate so far. The
+    tracker also collects partial results, flagged seconds and flagged words,
+    as soon as they are known; snapshots carry their totals and only the latest
+    flagged_limit of each, so they stay small on long media. Every change is
+    passed to on_update as a snapshot, at most once per min_interval seconds
+    unless a stage starts or finishes. Updates are delivered one at a time and
+    in order, so a slow write never overwrites a newer snapshot.
+    """
+
+    def __init__(
+        self,
+        stages: list,
+        on_update=None,
+        min_interval: float = 0.5,
+        flagged_limit: int = PROGRESS_FLAGGED_LIMIT,
+    ):
+        self.stages = {
+            name: {"completed": 0, "total": None, "started": None, "finished": None}
+            for name in stages
+        }
+        self.flagged_seconds = deque(maxlen=flagged_limit)
+        self.flagged_words = deque(maxlen=flagged_limit)
+        self.flagged_seconds_total = 0
+        self.flagged_words_total = 0
+        self.on_update = on_update  # Called with snapshot()
+        self.min_interval = min_interval
+        self.last_update = 0.0
+        self.lock = threading.Lock()
+        self.update_lock = threading.Lock()  # Serializes on_update calls
+
+    def start(self, stage: str, total: float | None = None) -> None:
+        with self.lock:
+            self.stages[stage].update(started=time.time(), total=total)
+        self.notify(force=True)
+
+    def set_total(self, stage: str, total: float) -> None:
+        with self.lock:
+            self.stages[stage]["total"] = total
+        self.notify()
+
+    def update(self, stage: str, completed: float) -> None:
+        """Set how many units of a stage are done."""
+        with self.lock:
+            self.stages[stage]["completed"] = completed
+        self.notify()
+
+    def finish(self, stage: str) -> None:
+        with self.lock:
+            state = self.stages[stage]
+            if state["total"] is not None:
+                state["completed"] = state["total"]
+            state["finished"] = time.time()
+        self.notify(force=True)
+
+    def add_flagged_second(self, second: int, harmful_detected: list) -> None:
+        with self.lock:
+            self.flagged_seconds.append({"second": second, "harmful_detected": list(harmful_detected)})
+            self.flagged_seconds_total += 1
+        self.notify()
+
+    def add_flagged_words(self, words: list) -> None:
+        with self.lock:
+            flagged = [
+                {"OriginalWord": x["OriginalWord"], "Start": x["Start"], "End": x["End"]}
+                for x in words
+                if x["IsProfane"]
+            ]
+            self.flagged_words.extend(flagged)
+            self.flagged_words_total += len(flagged)
+        self.notify()
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        with self.lock:
+            stages = {}
+            for name, state in self.stages.items():
+                completed, total, started = state["completed"], state["total"], state["started"]
+                if state["finished"]:
+                    status, eta = "done", 0.0
+                elif started is None:
+                    status, eta = "pending", None
+                else:
+                    status, eta = "running", None
+                    if total and completed:
+                        eta = round((now - started) / completed * (total - completed), 1)
+                stages[name] = {
+                    "status": status,
+                    "completed": round(completed, 2),
+                    "total": round(total, 2) if total is not None else None,
+                    "percent": round(100 * completed / total, 1) if total else None,
+                    "eta_seconds": eta,
+                }
+            return {
+                "stages": stages,
+                "flagged_seconds": list(self.flagged_seconds),
+                "flagged_seconds_total": self.flagged_seconds_total,
+                "flagged_words": list(self.flagged_words),
+                "flagged_words_total": self.flagged_words_total,
+            }
+
+    def notify(self, force: bool = False) -> None:
+        if self.on_update is None:
+            return
+        # Snapshot and deliver under update_lock, so updates from different threads
+        # reach on_update in the order they were taken
+        with self.update_lock:
+            now = time.monotonic()
+            with self.lock:
+                if not force and now - self.last_update < self.min_interval:
+                    return
+                self.last_update = now
+            self.on_update(self.snapshot())
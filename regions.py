@@ -0,0 +1,75 @@
+import os
+
+LOCALIZE = os.getenv("LOCALIZE_BLUR", "false").lower() in ("1", "true", "yes")  # Default blur mode
+REGION_GRID = int(os.getenv("REGION_GRID", 4))  # Image is scored as REGION_GRID x REGION_GRID cells
+
+
+def grid_edges(size: int, grid: int) -> list:
+    """Cell edges along one axis, on even pixels so yuv420 crops line up."""
+    return [min(size, round(i * size / grid) // 2 * 2) for i in range(grid)] + [size]
+
+
+def grid_windows(width: int, height: int, grid: int = REGION_GRID) -> list:
+    """
+    Patches scored for localization: every grid cell, plus 2x2-cell windows
+    with a stride of one cell so objects on cell borders are seen whole.
+
+    Returns:
+        list: (box, cells) tuples; box is (left, top, right, bottom) in pixels,
+            cells the (row, column) grid cells it covers
+    """
+    xs, ys = grid_edges(width, grid), grid_edges(height, grid)
+    windows = []
+    for span in (1, 2):
+        for row in range(grid - span + 1):
+            for column in range(grid - span + 1):
+                box = (xs[column], ys[row], xs[column + span], ys[row + span])
+                cells = [(r, c) for r in range(row, row + span) for c in range(column, column + span)]
+                windows.append((box, cells))
+    return windows
+
+
+def cell_regions(cells: dict, width: int, height: int, grid: int = REGION_GRID) -> list:
+    """
+    Merge flagged grid cells into bounding regions, one per group of touching cells.
+
+    Args:
+        cells (dict): (row, column) -> categories detected in windows covering the cell
+        width (int): Image width in pixels
+        height (int): Image height in pixels
+
+    Returns:
+        list: {"box": [left, top, right, bottom], "harmful_detected": [...]} per region
+    """
+    xs, ys = grid_edges(width, grid), grid_edges(height, grid)
+    regions = []
+    seen = set()
+    for start in sorted(cells):
+        if start in seen:
+            continue
+
+        # Flood fill the group of cells touching this one
+        group, stack = [], [start]
+        seen.add(start)
+        while stack:
+            row, column = stack.pop()
+            group.append((row, column))
+            for neighbour in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1)):
+                if neighbour in cells and neighbour not in seen:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+
+        rows = [row for row, _ in group]
+        columns = [column for _, column in group]
+        categories = []
+        for cell in sorted(group):
+            for category in cells[cell]:
+                if category not in categories:
+                    categories.append(category)
+        regions.append(
+            {
+                "box": [xs[min(columns)], ys[min(rows)], xs[max(columns) + 1], ys[max(rows) + 1]],
+                "harmful_detected": categories,
+            }
+        )
+    return regions
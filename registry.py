@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+WHISPER_CONCURRENCY = int(os.getenv("WHISPER_CONCURRENCY", 2))  # Transcriptions running at once
+# Threads per transcription: half of the cores split across the slots, CLIP gets the other half
+WHISPER_CPU_THREADS = int(
+    os.getenv("WHISPER_CPU_THREADS", max(1, (os.cpu_count() or 1) // 2 // WHISPER_CONCURRENCY))
+)
+
+
+def resident_bytes() -> int | None:
+    """Resident set size of this process, None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Loads every model artifact once per process and hands out the shared instance.
+
+    Entries are keyed by name and may carry a version (e.g. the file's mtime);
+    asking for a different version reloads the entry and drops the old one.
+    Load time and memory footprint (growth of the resident set while loading,
+    including anything loaded from inside the loader) are recorded per entry.
+    """
+
+    def __init__(self):
+        self.models = {}  # name -> shared instance
+        self.versions = {}  # name -> version the instance was loaded from
+        self.load_locks = {}  # name -> lock held while that entry loads
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.load_seconds = {}
+        self.memory_bytes = {}
+        self.loads = {}
+
+    def get(self, name: str, loader, version=None):
+        """
+        Return the shared instance of a model, loading it on first use.
+
+        Args:
+            name (str): Registry key, e.g. "offensive_classifier"
+            loader: Function without arguments that loads the model
+            version: Anything comparable; a different version triggers a reload
+
+        Returns:
+            The shared instance; callers must treat it as read-only
+        """
+        with self.lock:
+            if name in self.models and self.versions[name] == version:
+                return self.models[name]
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self.lock:
+                if name in self.models and self.versions[name] == version:
+                    return self.models[name]
+
+            memory_before = resident_bytes()
+            started = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - started
+            memory_after = resident_bytes()
+
+            with self.lock:
+                self.models[name] = model
+                self.versions[name] = version
+                self.load_seconds[name] = load_seconds
+                self.memory_bytes[name] = (
+                    max(0, memory_after - memory_before) if memory_before is not None else None
+                )
+                self.loads[name] = self.loads.get(name, 0) + 1
+            print(f"Loaded {name} in {load_seconds:.2f}s")
+            return model
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                name: {
+                    "load_seconds": round(self.load_seconds[name], 3),
+                    "memory_mb": (
+                        round(self.memory_bytes[name] / 1024**2, 1)
+                        if self.memory_bytes[name] is not None
+                        else None
+                    ),
+                    "loads": self.loads[name],
+                }
+                for name in self.models
+            }
+
+
+# Shared by every pipeline in the process
+model_registry = ModelRegistry()
+
+
+class WhisperRegistry:
+    """
+    Loads each Whisper model size once per process (through model_registry) and
+    shares it across requests.
+
+    A semaphore caps how many transcriptions run at the same time, so concurrent
+    requests queue for a slot instead of oversubscribing the CPU; each one uses
+    cpu_threads threads.
+    """
+
+    def __init__(
+        self,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        max_concurrent: int = 2,
+        cpu_threads: int = 0,
+    ):
+        self.device = device
+        self.compute_type = compute_type
+        self.max_concurrent = max_concurrent
+        self.cpu_threads = cpu_threads  # 0 leaves the CTranslate2 default
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.transcriptions = 0
+        self.transcribe_seconds = 0.0
+        self.queue_seconds = 0.0
+
+    def get(self, model_size: str):
+        """
+        Return the shared model of a size, loading it on first use.
+
+        Args:
+            model_size (str): Whisper model size, e.g. "tiny"
+
+        Returns:
+            WhisperModel: The shared model instance
+        """
+
+        def load():
+            from faster_whisper import WhisperModel
+
+            return WhisperModel(
+                model_size,
+                device=self.device,
+                compute_type=self.compute_type,
+                num_workers=self.max_concurrent,  # Parallel transcribe() calls from threads
+                cpu_threads=self.cpu_threads,
+            )
+
+        return model_registry.get(f"whisper-{model_size}", load)
+
+    def preload(self, model_sizes: list) -> None:
+        for model_size in model_sizes:
+            if model_size:
+                self.get(model_size.strip())
+
+    @contextmanager
+    def acquire(self, model_size: str, timings: dict | None = None):
+        """
+        Check out a model for one transcription, waiting for a free slot.
+
+        Args:
+            model_size (str): Whisper model size, e.g. "tiny"
+            timings (dict | None): Receives model_load_seconds, queue_seconds and transcribe_seconds
+
+        Yields:
+            WhisperModel: The shared model, usable until the block exits
+        """
+        model = self.get(model_size)
+
+        waited = time.perf_counter()
+        with self.slots:
+            started = time.perf_counter()
+            try:
+                yield model
+            finally:
+                finished = time.perf_counter()
+                with self.lock:
+                    self.transcriptions += 1
+                    self.transcribe_seconds += finished - started
+                    self.queue_seconds += started - waited
+                if timings is not None:
+                    timings["model_load_seconds"] = round(
+                        model_registry.load_seconds[f"whisper-{model_size}"], 3
+                    )
+                    timings["queue_seconds"] = round(started - waited, 3)
+                    timings["transcribe_seconds"] = round(finished - started, 3)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "cpu_threads": self.cpu_threads,
+                "transcriptions": self.transcriptions,
+                "transcribe_seconds": round(self.transcribe_seconds, 3),
+                "queue_seconds": round(self.queue_seconds, 3),
+            }
+
+
+# Shared by every AudioProfanityFilter in the process
+whisper_registry = WhisperRegistry(max_concurrent=WHISPER_CONCURRENCY, cpu_threads=WHISPER_CPU_THREADS)
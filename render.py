@@ -0,0 +1,557 @@
+import bisect
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+RENDER_DIR = "storage/output"  # Scratch space for rendered segments
+SMART_RENDER = os.getenv("SMART_RENDER", "true").lower() in ("1", "true", "yes")  # Stream-copy unflagged GOPs
+RENDER_CORES = int(os.getenv("RENDER_CORES", os.cpu_count() or 1))  # Core budget of one render
+RENDER_CHUNK_SECONDS = float(os.getenv("RENDER_CHUNK_SECONDS", 10))  # Target length of encoded chunks
+BLUR_FILTER = "boxblur=lr=6:lp=6:cr=6:cp=6"
+X264_PROFILES = {  # ffprobe profile name -> libx264 -profile:v
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+
+
+def merge_intervals(seconds: list) -> list:
+    """
+    Merge flagged seconds into (start, end) intervals, e.g. [3, 4, 5, 9] -> [(3, 6), (9, 10)].
+    """
+    intervals = []
+    for second in sorted(set(seconds)):
+        if intervals and second <= intervals[-1][1]:
+            intervals[-1][1] = second + 1
+        else:
+            intervals.append([second, second + 1])
+    return [tuple(interval) for interval in intervals]
+
+
+def merge_regions(regions: dict) -> list:
+    """
+    Merge per-second blur regions into intervals, one run of consecutive seconds per box.
+
+    Args:
+        regions (dict): second -> list of (left, top, right, bottom) boxes
+
+    Returns:
+        list: (start, end, box) tuples sorted by start
+    """
+    seconds_per_box = {}
+    for second, boxes in regions.items():
+        for box in boxes:
+            seconds_per_box.setdefault(tuple(box), []).append(second)
+    return sorted(
+        (start, end, box)
+        for box, seconds in seconds_per_box.items()
+        for start, end in merge_intervals(seconds)
+    )
+
+
+def enable_expr(intervals: list, offset: float) -> str:
+    """
+    One between() term per interval instead of one per second. Intervals are
+    half-open, [start, end), with 0.5 ms of slack so that frames on a boundary
+    fall on the same side whatever the offset's rounding.
+    """
+    return "+".join(
+        f"between(t,{start - offset - 0.0005:.4f},{end - offset - 0.0005:.4f})" for start, end, *_ in intervals
+    )
+
+
+def blur_filter(intervals: list, offset: float = 0.0) -> str:
+    """
+    boxblur filter enabled during the intervals, with times relative to offset.
+
+    Intervals are (start, end) for the whole frame or (start, end, box) for a
+    region only; each box is cropped, blurred and overlaid back while enabled.
+    """
+    whole = [interval for interval in intervals if len(interval) < 3 or interval[2] is None]
+    boxed = {}
+    for interval in intervals:
+        if len(interval) == 3 and interval[2] is not None:
+            boxed.setdefault(tuple(interval[2]), []).append(interval)
+    if not boxed:
+        return f"{BLUR_FILTER}:enable='{enable_expr(whole, offset)}'"
+
+    chains = ["split=" + str(len(boxed) + 1) + "[v]" + "".join(f"[r{i}]" for i in range(len(boxed)))]
+    if whole:
+        chains.append(f"[v]{BLUR_FILTER}:enable='{enable_expr(whole, offset)}'[w]")
+    current = "w" if whole else "v"
+    for i, ((left, top, right, bottom), spans) in enumerate(boxed.items()):
+        # boxblur radius is limited by the (chroma) size of the crop
+        radius = max(1, min(6, min(right - left, bottom - top) // 4 - 1))
+        chains.append(
+            f"[r{i}]crop={right - left}:{bottom - top}:{left}:{top},"
+            f"boxblur=lr={radius}:lp={radius}:cr={radius}:cp={radius}[b{i}]"
+        )
+        output = f"[o{i}]" if i < len(boxed) - 1 else ""  # The last overlay is the output
+        chains.append(f"[{current}][b{i}]overlay={left}:{top}:enable='{enable_expr(spans, offset)}'{output}")
+        current = f"o{i}"
+    return ";".join(chains)
+
+
+def probe_video(path: str) -> dict:
+    """
+    Codec, encoder-relevant properties, start time and duration of the first video stream.
+
+    Returns:
+        dict: ffprobe stream fields (codec_name, profile, level, pix_fmt, color_*,
+            time_base) plus float start_time and duration; {} on failure
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries",
+        "stream=codec_name,profile,level,pix_fmt,color_range,color_space,color_transfer,color_primaries,time_base"
+        ":format=start_time,duration",
+        "-of", "default=noprint_wrappers=1",
+        path,
+    ]
+    try:
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"ffprobe failed: {e}")
+        return {}
+
+    info = dict(line.split("=", 1) for line in output.splitlines() if "=" in line)
+    try:
+        info["duration"] = float(info["duration"])
+    except (KeyError, ValueError):
+        return {}
+    try:
+        info["start_time"] = float(info.get("start_time", 0))
+    except ValueError:
+        info["start_time"] = 0.0
+    return info
+
+
+def scan_packets(path: str) -> dict:
+    """
+    Cut points and packet count of the first video stream, read from packet flags.
+
+    A keyframe followed in decode order by frames shown before it starts an open
+    GOP: those frames reference the previous GOP, so it is not a cut point.
+
+    Returns:
+        dict: keyframes (sorted presentation times), delays (keyframe time ->
+            pts - dts) and packets (count); {} on failure
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,dts_time,flags",
+        "-of", "csv=p=0",
+        path,
+    ]
+    try:
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"ffprobe failed: {e}")
+        return {}
+
+    keyframes, delays, packets = [], {}, 0
+    open_gop = set()
+    for line in output.splitlines():
+        fields = line.split(",")
+        if len(fields) < 3:
+            continue
+        packets += 1
+        try:
+            pts = float(fields[0])
+        except ValueError:
+            continue
+        if "K" in fields[2]:
+            keyframes.append(pts)
+            try:
+                delays[pts] = pts - float(fields[1])
+            except ValueError:
+                delays[pts] = 0.0
+        elif keyframes and pts < keyframes[-1]:
+            open_gop.add(keyframes[-1])
+    return {
+        "keyframes": sorted(time for time in keyframes if time not in open_gop),
+        "delays": delays,
+        "packets": packets,
+    }
+
+
+def count_packets(path: str) -> int:
+    """Number of packets (frames) of the first video stream, -1 on failure."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-count_packets",
+        "-show_entries", "stream=nb_read_packets",
+        "-of", "csv=p=0",
+        path,
+    ]
+    try:
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        return int(output.strip().split(",")[0])
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        print(f"ffprobe failed: {e}")
+        return -1
+
+
+def encoder_args(info: dict) -> list:
+    """
+    libx264 arguments that make encoded GOPs fit between stream-copied ones:
+    the source's profile, level, pixel format and color description, and no
+    B-frames so the encoded GOPs only need the dts shift of render_segment().
+    """
+    args = ["-bf", "0"]
+    profile = X264_PROFILES.get(info.get("profile", ""))
+    if profile:
+        args += ["-profile:v", profile]
+    level = info.get("level", "")
+    if level.isdigit() and int(level) >= 10:
+        args += ["-level:v", f"{int(level) // 10}.{int(level) % 10}"]
+    if info.get("pix_fmt"):
+        args += ["-pix_fmt", info["pix_fmt"]]
+    for field, option in (
+        ("color_range", "-color_range"),
+        ("color_space", "-colorspace"),
+        ("color_transfer", "-color_trc"),
+        ("color_primaries", "-color_primaries"),
+    ):
+        if info.get(field) not in (None, "", "unknown"):
+            args += [option, info[field]]
+    return args
+
+
+def plan_segments(intervals: list, keyframes: list, duration: float) -> list:
+    """
+    Split the video into segments that are either stream-copied or re-encoded.
+
+    Every flagged interval is widened to the GOPs around it (previous keyframe to
+    next keyframe), so copied segments always start on a keyframe.
+
+    Args:
+        intervals (list): Flagged (start, end) or (start, end, box) intervals in seconds, sorted by start
+        keyframes (list): Sorted keyframe times
+        duration (float): Video duration in seconds
+
+    Returns:
+        list: (start, end, encode) tuples covering [0, duration] in order
+    """
+    spans = []
+    for start, end, *_ in intervals:
+        i = bisect.bisect_right(keyframes, start) - 1
+        gop_start = keyframes[i] if i >= 0 else 0.0
+        j = bisect.bisect_left(keyframes, end)
+        gop_end = keyframes[j] if j < len(keyframes) else duration
+        if spans and gop_start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], gop_end)
+        else:
+            spans.append([gop_start, gop_end])
+
+    segments = []
+    position = 0.0
+    for start, end in spans:
+        if start > position:
+            segments.append((position, start, False))
+        segments.append((start, min(end, duration), True))
+        position = end
+    if position < duration:
+        segments.append((position, duration, False))
+    return segments
+
+
+def split_segments(segments: list, keyframes: list, chunk_seconds: float) -> list:
+    """
+    Split encode segments at keyframes into chunks of about chunk_seconds, so
+    they can be encoded in parallel. Copy segments are left whole.
+    """
+    chunks = []
+    for start, end, encode in segments:
+        if not encode:
+            chunks.append((start, end, encode))
+            continue
+
+        chunk_start = start
+        for keyframe in keyframes[bisect.bisect_right(keyframes, start):]:
+            if keyframe >= end:
+                break
+            if keyframe - chunk_start >= chunk_seconds:
+                chunks.append((chunk_start, keyframe, True))
+                chunk_start = keyframe
+        chunks.append((chunk_start, end, True))
+    return chunks
+
+
+def split_video(input_video: str, times: list, annexb: bool, pattern: str) -> None:
+    """
+    Stream-copy the video track into one file per segment, cut at the keyframes
+    at times. Every packet lands in exactly one file, unlike seeking per segment.
+    H.264 is written as Annex B MPEG-TS, which carries its own parameter sets so
+    copied and encoded segments can be joined; other codecs go into NUT.
+    """
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", input_video,
+        "-map", "0:v:0",
+        "-c:v", "copy",
+        *(["-bsf:v", "h264_mp4toannexb"] if annexb else []),
+        "-f", "segment",
+        "-segment_format", "mpegts" if annexb else "nut",
+        "-segment_times", ",".join(f"{time:.6f}" for time in times),
+        "-segment_time_delta", "0.0005",  # Printed keyframe times are rounded to microseconds
+        "-reset_timestamps", "1",
+        pattern,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def render_segment(
+    segment_path: str,
+    start: float,
+    end: float,
+    intervals: list,
+    codec_args: list,
+    delay: float,
+    output_path: str,
+    threads: int = 0,
+) -> None:
+    """
+    Blur and re-encode one split_video() segment as Annex B MPEG-TS, keeping
+    every frame and its timestamp. Decode times are moved delay before the
+    presentation times, as in the source, so they stay increasing where the
+    segment meets copied ones.
+    """
+    overlapping = [interval for interval in intervals if interval[0] < end and interval[1] > start]
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", segment_path,
+        "-map", "0:v:0",
+        *(["-vf", blur_filter(overlapping, offset=start)] if overlapping else []),
+        "-c:v", "libx264", "-threads", str(threads),
+        *codec_args,
+        "-fps_mode", "passthrough", "-enc_time_base", "-1",  # Source frames and timestamps, as in the single encode
+        *(["-bsf:v", f"setts=dts=PTS-{delay:.6f}/TB"] if delay > 0 else []),
+        "-f", "mpegts",
+        output_path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def render(
+    input_video: str,
+    intervals: list,
+    audio_path: str,
+    output_path: str,
+    smart: bool = SMART_RENDER,
+    cores: int = RENDER_CORES,
+) -> bool:
+    """
+    Blur the flagged intervals, encoding keyframe-aligned chunks in parallel
+    ffmpeg processes, join them losslessly and mux in the moderated audio.
+
+    For H.264 sources with smart enabled only the GOPs overlapping the intervals
+    are re-encoded, with encoder_args() taken from the source, and everything
+    else is stream-copied; otherwise the whole video is re-encoded chunk by
+    chunk. The video is split once at the chunk keyframes and joined with the
+    exact chunk durations, so frames and timestamps match a single-process
+    encode. The joined track is checked to hold as many frames as the source
+    before the audio is added.
+
+    Args:
+        input_video (str): Source video
+        intervals (list): Flagged intervals in seconds, see blur_filter()
+        audio_path (str): Moderated audio track
+        output_path (str): Where the final video is written
+        smart (bool): Stream-copy unflagged GOPs of H.264 sources
+        cores (int): Most CPU cores the render may use
+
+    Returns:
+        bool: False if nothing was rendered (no cut points, a single core with
+            nothing to copy, an ffmpeg error or a frame count mismatch); the
+            caller then runs one ffmpeg over the whole file
+    """
+    info = probe_video(input_video)
+    packets = scan_packets(input_video) if info else {}
+    if not packets.get("keyframes"):
+        return False
+
+    # Times relative to the first frame, as in the blur filter and ffmpeg output
+    keyframes = [time - info["start_time"] for time in packets["keyframes"]]
+    delays = {time - info["start_time"]: delay for time, delay in packets["delays"].items()}
+    duration = info["duration"]
+    h264 = info.get("codec_name") == "h264"
+
+    if smart and h264:
+        segments = plan_segments(intervals, keyframes, duration)
+        codec_args = encoder_args(info)
+    elif cores > 1:
+        segments = [(0.0, duration, True)]
+        codec_args = []
+    else:
+        return False  # A single ffmpeg pass is just as fast
+
+    segments = split_segments(segments, keyframes, RENDER_CHUNK_SECONDS)
+    if len(segments) < 2:
+        return False  # No cut points inside the video, one segment is a single encode
+    encoded = sum(1 for _, _, encode in segments if encode)
+    workers = max(1, min(cores, encoded))
+    threads = max(1, cores // workers)  # x264 threads per chunk, within the core budget
+
+    os.makedirs(RENDER_DIR, exist_ok=True)
+    workdir = tempfile.mkdtemp(dir=RENDER_DIR)
+    try:
+        extension = "ts" if h264 else "nut"
+        split_video(
+            input_video,
+            [start for start, _, _ in segments[1:]],
+            h264,
+            os.path.join(workdir, f"source%d.{extension}"),
+        )
+        source_paths = [os.path.join(workdir, f"source{i}.{extension}") for i in range(len(segments))]
+        if not all(os.path.exists(path) for path in source_paths):
+            print("Chunked render failed, the video did not split at the planned keyframes")
+            return False
+
+        segment_paths = [
+            os.path.join(workdir, f"{i}.ts") if encode else source_path
+            for i, ((_, _, encode), source_path) in enumerate(zip(segments, source_paths))
+        ]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Each task runs its own ffmpeg process; result() re-raises ffmpeg errors
+            futures = [
+                executor.submit(
+                    render_segment,
+                    source_path, start, end, intervals, codec_args,
+                    delays.get(start, 0.0) if codec_args else 0.0,
+                    segment_path, threads,
+                )
+                for (start, end, encode), source_path, segment_path in zip(segments, source_paths, segment_paths)
+                if encode
+            ]
+            for future in futures:
+                future.result()
+
+        # Exact durations: the concat demuxer otherwise estimates each file's length
+        list_path = os.path.join(workdir, "segments.txt")
+        with open(list_path, "w") as segment_list:
+            for (start, end, _), segment_path in zip(segments, segment_paths):
+                segment_list.write(f"file '{os.path.abspath(segment_path)}'\n")
+                segment_list.write(f"duration {end - start:.6f}\n")
+
+        timescale = info.get("time_base", "").partition("/")[2]
+        timescale_args = ["-video_track_timescale", timescale] if timescale.isdigit() else []
+        video_path = os.path.join(workdir, "video.mp4")
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0",
+            "-i", list_path,
+            "-map", "0:v:0",
+            "-c:v", "copy",
+            *timescale_args,
+            video_path,
+        ]
+        subprocess.run(cmd, check=True)
+
+        joined = count_packets(video_path)
+        if joined != packets["packets"]:
+            print(f"Chunked render has {joined} frames instead of {packets['packets']}, re-encoding instead")
+            return False
+
+        # Mux in the moderated audio, the video track is copied as is
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", video_path,
+            "-i", audio_path,
+            "-map", "0:v:0",
+            "-map", "1:a:0",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            *timescale_args,
+            "-shortest",
+            output_path,
+        ]
+        subprocess.run(cmd, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Chunked render failed, falling back to a single encode: {e}")
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def replace_audio(input_video: str, audio_path: str, output_path: str) -> bool:
+    """
+    Copy the video track untouched and mux in the moderated audio.
+
+    Returns:
+        bool: False if the video is not H.264 (other codecs may not fit in MP4)
+            or ffmpeg failed; the caller then re-encodes
+    """
+    if probe_video(input_video).get("codec_name") != "h264":
+        return False
+
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", input_video,
+        "-i", audio_path,
+        "-map", "0:v:0",
+        "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-shortest",
+        output_path,
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Copying the video track failed, re-encoding instead: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Round trip against a single-process encode: python render.py video.mp4 [flagged seconds...]
+    import sys
+
+    def frame_times(path):
+        cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time", "-of", "csv=p=0", path]
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        return sorted(round(float(line.strip(",")), 3) for line in output.splitlines() if line.strip(",") != "N/A")
+
+    source = sys.argv[1]
+    intervals = merge_intervals([int(second) for second in sys.argv[2:]] or [1])
+    workdir = tempfile.mkdtemp()
+    audio = os.path.join(workdir, "audio.m4a")
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", "anullsrc",
+         "-t", str(probe_video(source)["duration"] + 1), audio],
+        check=True,
+    )
+
+    # The same command blur_and_audio() falls back to
+    single = os.path.join(workdir, "single.mp4")
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", source, "-i", audio, "-map", "0:v:0", "-map", "1:a:0",
+         "-vf", blur_filter(intervals), "-fps_mode", "passthrough", "-enc_time_base", "-1",
+         "-c:v", "libx264", "-c:a", "aac", "-shortest", single],
+        check=True,
+    )
+    expected = frame_times(single)
+
+    failed = False
+    for smart in (True, False):
+        output = os.path.join(workdir, f"smart_{smart}.mp4")
+        if not render(source, intervals, audio, output, smart=smart, cores=max(2, RENDER_CORES)):
+            print(f"smart={smart}: not rendered, the single encode is used")
+            continue
+        times = frame_times(output)
+        matches = times == expected
+        failed |= not matches
+        print(f"smart={smart}: {len(times)} frames, single encode {len(expected)},", "pts match" if matches else "pts differ")
+    shutil.rmtree(workdir, ignore_errors=True)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+FILES_DIR = "storage/files"  # Uploads and moderated outputs
+RESULTS_DIR = "storage/cache/results"  # One JSON entry per cached request
+CHUNK_SIZE = 1 << 20  # Bytes read per step while hashing uploads
+
+
+def save_and_hash(file_storage, path: str) -> str:
+    """
+    Save an uploaded file and hash it in the same pass.
+
+    Args:
+        file_storage: werkzeug FileStorage from request.files
+        path (str): Where the upload is written
+
+    Returns:
+        str: Hex SHA-256 of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        while chunk := file_storage.stream.read(CHUNK_SIZE):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def keep_copy(source: str, destination: str) -> None:
+    """Hard-link source to destination, or copy it across file systems."""
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def request_key(kind: str, content_hash: str, **params) -> str:
+    """
+    Content address of a moderation request: the upload's hash plus the
+    normalized parameters that change the output.
+
+    Args:
+        kind (str): "AUDIO", "IMAGE" or "VIDEO"
+        content_hash (str): SHA-256 of the uploaded file
+        **params: Request parameters, lists are treated as unordered sets
+
+    Returns:
+        str: Hex SHA-256 cache key
+    """
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, (list, tuple, set)):
+            value = sorted({str(x).strip() for x in value if str(x).strip()})
+        normalized[name] = value
+    payload = json.dumps([kind, content_hash, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of whole moderation results.
+
+    An entry stores the response data and the output artifacts it points to in
+    storage/files. Those outputs also belong to the database rows of every
+    request that returned them, so the cache never deletes them: it keeps its
+    own copy of each artifact in results_dir/files (a hard link where the file
+    system allows) and restores an output from it if it was removed.
+
+    Recency and sizes are kept in an in-memory index, loaded from results_dir
+    once at startup. Hits touch the entry file so the order survives restarts.
+    When the kept copies grow past max_bytes, the least recently used entries
+    are dropped together with their copies.
+    """
+
+    def __init__(self, max_bytes: int, files_dir: str = FILES_DIR, results_dir: str = RESULTS_DIR):
+        self.max_bytes = max_bytes
+        self.files_dir = files_dir
+        self.results_dir = results_dir
+        self.artifacts_dir = os.path.join(results_dir, "files")  # Copies owned by the cache
+        self.lock = threading.Lock()
+
+        # Index: key -> artifacts, least recently used first
+        self.index = OrderedDict()
+        self.references = {}  # Artifact name -> number of entries referring to it
+        self.sizes = {}  # Artifact name -> size of the cache's copy
+        self.used = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self.load_index()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.results_dir, f"{key}.json")
+
+    def load_index(self) -> None:
+        """Read every entry once, oldest first, into the in-memory index."""
+        entries = []  # (mtime, key, artifacts)
+        try:
+            with os.scandir(self.results_dir) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        with open(entry.path, "r", encoding="utf-8") as f:
+                            artifacts = json.load(f)["artifacts"]
+                        entries.append((entry.stat().st_mtime, entry.name[: -len(".json")], artifacts))
+                    except (OSError, ValueError, KeyError):
+                        continue
+        except OSError:
+            return
+
+        for _, key, artifacts in sorted(entries):
+            self.add(key, artifacts)
+
+    def add(self, key: str, artifacts: list) -> None:
+        """Index an entry. Called with the lock held (or before the cache is shared)."""
+        self.index[key] = artifacts
+        for name in artifacts:
+            self.references[name] = self.references.get(name, 0) + 1
+            if name not in self.sizes:
+                try:
+                    self.sizes[name] = os.path.getsize(os.path.join(self.artifacts_dir, name))
+                except OSError:
+                    self.sizes[name] = 0
+                self.used += self.sizes[name]
+
+    def forget(self, key: str) -> list:
+        """
+        Drop an entry from the index. Called with the lock held.
+
+        Returns:
+            list: Artifacts no other entry refers to, whose copies can be deleted
+        """
+        unreferenced = []
+        for name in self.index.pop(key, ()):
+            self.references[name] -= 1
+            if self.references[name] == 0:
+                del self.references[name]
+                self.used -= self.sizes.pop(name, 0)
+                unreferenced.append(name)
+        return unreferenced
+
+    def get(self, key: str) -> dict | None:
+        """
+        Look up a previous result.
+
+        Args:
+            key (str): Key from request_key()
+
+        Returns:
+            dict | None: The stored response data, None if missing or an artifact is lost
+        """
+        with self.lock:
+            known = key in self.index
+            if not known:
+                self.misses += 1
+        if not known:
+            return None
+
+        path = self.entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            for name in entry["artifacts"]:
+                output = os.path.join(self.files_dir, name)
+                if not os.path.exists(output):
+                    keep_copy(os.path.join(self.artifacts_dir, name), output)  # Output was removed
+            os.utime(path)  # Mark as recently used across restarts
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading cached result: {e}")
+            with self.lock:
+                unreferenced = self.forget(key)
+                self.misses += 1
+            self.remove(path, unreferenced)
+            return None
+
+        with self.lock:
+            if key in self.index:
+                self.index.move_to_end(key)
+            self.hits += 1
+        return entry["data"]
+
+    def put(self, key: str, data: dict, artifacts: list) -> None:
+        """
+        Store a result and evict old ones if the cache's copies are over budget.
+
+        Args:
+            key (str): Key from request_key()
+            data (dict): Response data to return on a hit
+            artifacts (list): Output file names in storage/files the data refers to
+        """
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        path = self.entry_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            for name in artifacts:
+                copy = os.path.join(self.artifacts_dir, name)
+                if not os.path.exists(copy):
+                    keep_copy(os.path.join(self.files_dir, name), copy)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "artifacts": artifacts, "data": data}, f)
+            os.replace(temp_path, path)  # Readers never see a half-written entry
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error caching result: {e}")
+            return
+
+        with self.lock:
+            stale = self.forget(key)  # Replaced entry of the same key
+            self.add(key, artifacts)
+            self.stores += 1
+            evicted = self.evict(keep=key)
+        self.remove(None, [name for name in stale if name not in artifacts])
+        for victim, unreferenced in evicted:
+            self.remove(self.entry_path(victim), unreferenced)
+
+    def remove(self, path: str | None, artifacts: list = ()) -> None:
+        """Delete an entry file and the cache's copies of the given artifacts."""
+        for name in artifacts:
+            try:
+                os.remove(os.path.join(self.artifacts_dir, name))
+            except OSError:
+                pass
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self, keep: str) -> list:
+        """
+        Drop least recently used entries from the index until the copies fit
+        max_bytes. The entry keep (the one just stored) stays. Called with the
+        lock held; the caller deletes the returned entries outside of it.
+
+        Returns:
+            list: (key, unreferenced artifacts) of every evicted entry
+        """
+        evicted = []
+        if self.max_bytes <= 0:
+            return evicted
+
+        for key in list(self.index):
+            if self.used <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            evicted.append((key, self.forget(key)))
+            self.evictions += 1
+        return evicted
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_bytes": self.max_bytes,
+                "bytes": self.used,
+                "entries": len(self.index),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared by the audio, image and video endpoints
+result_cache = ResultCache(max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", 5 * 1024**3)))
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+
+SAMPLE_FPS = float(os.getenv("SAMPLE_FPS", 4))  # Frames per second checked with cheap signals
+DETECT_FPS = float(os.getenv("DETECT_FPS", 2))  # Most frames per second sent to CLIP
+SCENE_THRESHOLD = float(os.getenv("SCENE_THRESHOLD", 0.08))  # 0..1 change that counts as a new scene
+
+
+class AdaptiveFrameSampler:
+    """
+    Decides which sampled video frames need a fresh CLIP verdict.
+
+    Every candidate frame gets a cheap signature (a ~32px grayscale thumbnail and
+    a 16-bin histogram). Frames that barely differ from the last analyzed frame
+    reuse its verdict; scene changes are analyzed, up to detect_fps frames per
+    second of video.
+    """
+
+    def __init__(
+        self,
+        sample_fps: float = SAMPLE_FPS,
+        detect_fps: float = DETECT_FPS,
+        threshold: float = SCENE_THRESHOLD,
+    ):
+        self.sample_fps = max(1.0, float(sample_fps))  # At least one candidate per second
+        self.detect_fps = max(1.0, float(detect_fps))
+        self.threshold = threshold
+
+        self.reference = None  # Signature of the last analyzed frame
+        self.second = None
+        self.analyzed_this_second = 0
+
+        # Counters
+        self.candidates = 0
+        self.analyzed = 0
+
+    @staticmethod
+    def signature(frame) -> tuple:
+        step = max(1, min(frame.shape[0], frame.shape[1]) // 32)
+        thumbnail = frame[::step, ::step].astype(np.float32)
+        if thumbnail.ndim == 3:
+            thumbnail = thumbnail.mean(axis=2)  # Grayscale
+        histogram = np.histogram(thumbnail, bins=16, range=(0, 255))[0] / thumbnail.size
+        return thumbnail, histogram
+
+    @staticmethod
+    def difference(a: tuple, b: tuple) -> float:
+        """Returns 0 for identical frames up to 1 for completely different ones."""
+        if a[0].shape != b[0].shape:
+            return 1.0
+        pixels = float(np.abs(a[0] - b[0]).mean()) / 255
+        histogram = float(np.abs(a[1] - b[1]).sum()) / 2
+        return max(pixels, histogram)
+
+    def should_analyze(self, frame, second: int) -> bool:
+        """
+        Args:
+            frame: RGB NumPy array of the candidate frame
+            second (int): Second of the video the frame belongs to
+
+        Returns:
+            bool: True if the frame needs a CLIP verdict, False to reuse the last one
+        """
+        self.candidates += 1
+        if second != self.second:
+            self.second = second
+            self.analyzed_this_second = 0
+
+        signature = self.signature(frame)
+        if self.reference is not None:
+            if self.difference(signature, self.reference) < self.threshold:
+                return False  # Near-duplicate of the last analyzed frame
+            if self.analyzed_this_second >= self.detect_fps:
+                return False  # Budget for this second is used up
+
+        self.reference = signature
+        self.analyzed_this_second += 1
+        self.analyzed += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "sample_fps": self.sample_fps,
+            "detect_fps": self.detect_fps,
+            "candidates": self.candidates,
+            "analyzed": self.analyzed,
+            "reused": self.candidates - self.analyzed,
+        }
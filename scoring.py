@@ -0,0 +1,137 @@
+import math
+
+from scipy.special import expit
+
+
+class SparseDotScorer:
+    """
+    Scores texts straight from the fitted TF-IDF vectorizer and logistic regression
+    without going through sklearn's transform/predict_proba call chain.
+
+    The vocabulary is compiled into a term -> (column, idf, coefficient) table, so a
+    text costs one dictionary lookup per token plus a short dot product. Features
+    are weighted, normalized and summed in the same order sklearn uses, which keeps
+    the decisions identical to TextProfanityFilter.predict_batch.
+    """
+
+    def __init__(self, vectorizer, model) -> None:
+        if getattr(vectorizer, "sublinear_tf", False) or vectorizer.norm not in ("l2", None):
+            raise ValueError("SparseDotScorer supports plain tf with l2 or no normalization")
+        if model.coef_.shape[0] != 1:
+            raise ValueError("SparseDotScorer supports binary classifiers only")
+
+        self.analyzer = vectorizer.build_analyzer()  # Same preprocessing and tokenization
+        self.binary = vectorizer.binary
+        self.normalize = vectorizer.norm == "l2"
+        self.classes = model.classes_
+        self.intercept = float(model.intercept_[0])
+
+        idf = vectorizer.idf_ if vectorizer.use_idf else None
+        coef = model.coef_[0]
+        self.weights = {
+            term: (int(column), 1.0 if idf is None else float(idf[column]), float(coef[column]))
+            for term, column in vectorizer.vocabulary_.items()
+        }
+
+    def score(self, text: str) -> float:
+        """
+        Compute the logistic regression logit of a text.
+
+        Args:
+            text (str): The text to score
+
+        Returns:
+            float: Decision function value, > 0 means the offensive class
+        """
+        counts = {}
+        for term in self.analyzer(text):
+            weight = self.weights.get(term)
+            if weight is not None:
+                counts[weight] = counts.get(weight, 0) + 1
+
+        if not counts:
+            return self.intercept
+
+        # sklearn keeps row features sorted by column
+        features = sorted(counts.items())
+        values = [
+            (1.0 if self.binary else float(count)) * idf
+            for (_, idf, _), count in features
+        ]
+
+        if self.normalize:
+            norm = 0.0
+            for value in values:
+                norm += value * value
+            norm = math.sqrt(norm)
+            values = [value / norm for value in values]
+
+        logit = 0.0
+        for value, ((_, _, coef), _) in zip(values, features):
+            logit += value * coef
+
+        return logit + self.intercept
+
+    def predict(self, text: str) -> bool:
+        """
+        Predict if a single text is offensive or not.
+
+        Args:
+            text (str): The text to classify
+
+        Returns:
+            bool: True if the text is classified as offensive
+        """
+        proba = float(expit(self.score(text)))
+        prediction = self.classes[1] if proba > 1.0 - proba else self.classes[0]
+        return int(prediction) == 1 and proba * 100 > 50.0
+
+    def predict_batch(self, texts: list) -> list:
+        """
+        Predict offensiveness for many texts.
+
+        Args:
+            texts (list): The texts to classify
+
+        Returns:
+            list: One boolean per text, True if the text is classified as offensive
+        """
+        return [self.predict(text) for text in texts]
+
+    def parity(self, texts: list, reference) -> list:
+        """
+        Compare the decisions of this scorer against a reference implementation.
+
+        Args:
+            texts (list): The texts to classify
+            reference (callable): Batch predictor to compare with, e.g. TextProfanityFilter.predict_batch
+
+        Returns:
+            list: The texts on which both implementations disagree
+        """
+        expected = reference(texts)
+        return [
+            text
+            for text, ours, theirs in zip(texts, self.predict_batch(texts), expected)
+            if ours != theirs
+        ]
+
+
+if __name__ == "__main__":
+    # Parity check against the sklearn path: python scoring.py
+    import json
+
+    from text import TextProfanityFilter
+
+    tpf = TextProfanityFilter()
+    with open("model/badwords.json", "r", encoding="utf-8") as f:
+        texts = json.load(f)["bad_words"]
+    texts += tpf.badwords + tpf.goodwords
+    texts += [" ".join(texts[i : i + 7]) for i in range(0, len(texts), 7)]
+    texts += ["", "You are a fucking asshole", "have a nice day", "12345 !!!"]
+
+    mismatches = tpf.scorer.parity(texts, tpf.predict_batch)
+    print(f"{len(texts) - len(mismatches)}/{len(texts)} decisions match the sklearn path")
+    for text in mismatches:
+        print(f"Mismatch: {text!r}")
+    raise SystemExit(1 if mismatches else 0)
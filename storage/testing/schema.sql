@@ -80,3 +80,15 @@ create table video_content_detections
     detected_content        varchar(4000),
 )
 
+create table detected_regions
+(
+    detected_region_id      bigint      primary key,
+    input_content_id        bigint      references              input_contents(input_content_id),
+    start_second            bigint,         -- null for images
+    end_second              bigint,
+    box_left                int,            -- pixels
+    box_top                 int,
+    box_right               int,
+    box_bottom              int,
+    detected_content        varchar(4000)
+)
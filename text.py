@@ -1,13 +1,18 @@
+import threading
+
 import joblib
 
+from cache import MODEL_PATH, VECTORIZER_PATH, verdict_cache
+from lexicon import LexiconMatcher
+from registry import model_registry
+from scoring import SparseDotScorer
+
 
 class TextProfanityFilter:
     def __init__(self) -> None:
         # Load the saved model and vectorizer
-        self.model = joblib.load("model/offensive_classifier.joblib")
-        self.vectorizer = joblib.load("model/tfidf_vectorizer.joblib")
-
-        self.moderated_json = []  # List for filtered text
+        self.artifact_lock = threading.Lock()  # Guards reloading the artifacts
+        self.load_artifacts()
 
         # Replacements for text
         self.replacements = {
@@ -968,6 +973,67 @@ class TextProfanityFilter:
             "yury",
         ]
 
+        # Compiled lookups, built once so a check never scans the word lists
+        self.goodword_set = frozenset(word.lower() for word in self.goodwords)
+        self.lexicon = LexiconMatcher(self.badwords, normalize=self.convert_leetspeak)
+
+    def load_artifacts(self) -> None:
+        """
+        Get the model and vectorizer from the shared registry, which loads each
+        version from disk once per process, and remember which version was loaded.
+        """
+        self.artifact_fingerprint = verdict_cache.artifact_fingerprint()
+        model_version, vectorizer_version = self.artifact_fingerprint
+        self.model = model_registry.get(
+            "offensive_classifier", lambda: joblib.load(MODEL_PATH), version=model_version
+        )
+        self.vectorizer = model_registry.get(
+            "tfidf_vectorizer", lambda: joblib.load(VECTORIZER_PATH), version=vectorizer_version
+        )
+        self.scorer = model_registry.get(
+            "sparse_dot_scorer",
+            lambda: SparseDotScorer(self.vectorizer, self.model),  # sklearn-free scoring
+            version=self.artifact_fingerprint,
+        )
+
+    def refresh_artifacts(self) -> tuple:
+        """
+        Reload the model if an artifact changed on disk and drop cached verdicts of the old one.
+
+        Returns:
+            tuple: (scorer, fingerprint) of the loaded model, read together
+        """
+        on_disk = verdict_cache.artifact_fingerprint()
+        with self.artifact_lock:
+            if on_disk != self.artifact_fingerprint:
+                self.load_artifacts()
+            scorer, fingerprint = self.scorer, self.artifact_fingerprint
+        verdict_cache.sync(fingerprint)
+        return scorer, fingerprint
+
+    def classify_words(self, words: list) -> dict:
+        """
+        Classify words with the ML model, reusing verdicts from the shared cache.
+
+        Custom words are not part of the verdict; callers apply them on top with
+        isBadWord() so they never end up in the shared cache.
+
+        Args:
+            words (list): Normalized words to classify
+
+        Returns:
+            dict: word -> True if the model classifies it as offensive
+        """
+        scorer, fingerprint = self.refresh_artifacts()
+
+        verdicts = verdict_cache.get_many(words, fingerprint)
+        missing = [word for word in words if word not in verdicts]
+        if missing:
+            computed = dict(zip(missing, scorer.predict_batch(missing)))
+            verdict_cache.put_many(computed, fingerprint)
+            verdicts.update(computed)
+        return verdicts
+
     def convert_leetspeak(self, text: str) -> str:
         """
         Converts leetspeak text to normal text if the result is a valid dictionary word.
@@ -996,12 +1062,12 @@ class TextProfanityFilter:
             bool: True if the word exists in the bad words list, False otherwise
         """
         try:
-            return word in self.badwords or word.lstrip().lower() in custom_words
+            return word in self.lexicon or word.lstrip().lower() in custom_words
         except TypeError:
             return False
 
     def isGoodWord(self, word: str) -> bool:
-        if word.strip().lower() in self.goodwords:
+        if word.strip().lower() in self.goodword_set:
             return True
         else:
             return False
@@ -1014,22 +1080,35 @@ class TextProfanityFilter:
             text (str): The text to classify
 
         Returns:
-            dict: Dictionary containing prediction (0 or 1) and probability
+            bool: True if the text is classified as offensive
         """
-        # Convert text to TF-IDF features
-        text_tfidf = self.vectorizer.transform([text])
+        return self.scorer.predict(text)
 
-        # Get prediction
-        prediction = self.model.predict(text_tfidf)[0]
+    def predict_batch(self, texts: list) -> list:
+        """
+        Predict offensiveness for many texts with a single vectorizer and model pass.
+        This is the sklearn reference path that SparseDotScorer is checked against.
 
-        # Get probability scores
-        proba = self.model.predict_proba(text_tfidf)[0]
+        Args:
+            texts (list): The texts to classify (e.g. a sentence followed by its words)
 
-        # print("Word is: " + text + "\n" + str(int(prediction)) + " is prediction\n" + str(float(proba[1])) + " is probation percentage")
-        if int(prediction) == 1 and float(proba[1]) * 100 > 50.0:
-            return True
-        else:
-            return False
+        Returns:
+            list: One boolean per text, True if the text is classified as offensive
+        """
+        if not texts:
+            return []
+
+        # Convert all texts to one sparse TF-IDF matrix
+        texts_tfidf = self.vectorizer.transform(texts)
+
+        # Get probability scores; the prediction is the most probable class
+        probas = self.model.predict_proba(texts_tfidf)
+        predictions = self.model.classes_[probas.argmax(axis=1)]
+
+        return [
+            int(prediction) == 1 and float(proba[1]) * 100 > 50.0
+            for prediction, proba in zip(predictions, probas)
+        ]
 
     def textProfanityFilteration(
         self,
@@ -1057,40 +1136,152 @@ class TextProfanityFilter:
                 - "IsProfane": Boolean indicating if word was profane
                 - "FilteredWord": Original word or masked version if profane
         """
+        return self.moderate_lines(
+            [profane_sentence], mask_char=mask_char, custom_words=custom_words
+        )[0]
+
+    def moderate_lines(
+        self,
+        sentences: list,
+        mask_char: str = "*",
+        custom_words: list | None = None,
+    ) -> list:
+        """
+        Filter profanity from many sentences (e.g. lines of a file) at once.
+
+        Only lines with a lexicon hit or a profane sentence verdict are moderated
+        word by word; their words are classified together, so repeated words
+        across those lines cost a single lookup.
+
+        Args:
+            sentences (list): The texts to check for profanity
+            mask_char (str): Character to replace profane words (e.g. "🤬", "*")
+            custom_words (list | None, optional): Additional custom bad words to check. Defaults to None.
+
+        Returns:
+            list: One textProfanityFilteration() result per sentence
+        """
         # Convert any leetspeak or symbols to normal readable text
-        if len(self.moderated_json) > 0:
-            self.moderated_json = []  # Making the list empty
+        normal_texts = [self.convert_leetspeak(sentence) for sentence in sentences]
+        lines = [normal_text.split() for normal_text in normal_texts]
 
-        normal_text = self.convert_leetspeak(profane_sentence)
+        # Bad words and multi-word phrases ("blue waffle") found in one pass per line
+        lexicon_hits = [self.lexicon.flagged_positions(words) for words in lines]
 
-        if self.predict_text(text=normal_text):
-            # Process each word in the normalized text
-            for word in normal_text.split():
-                if self.isGoodWord(word.lower()):
-                    self.moderated_json.append(
-                        {
-                            "OriginalWord": word,
-                            "IsProfane": False,
-                            "FilteredWord": word,
-                        }
-                    )
-                # Check if word is profane using ML model or exists in bad words list
-                elif self.predict_text(text=word) or self.isBadWord(
-                    word=word, custom_words=custom_words
-                ):
-                    # If profane, mask the word and mark as profane
-                    self.moderated_json.append(
-                        {
-                            "OriginalWord": word,
-                            "IsProfane": True,
-                            "FilteredWord": 4 * mask_char,
-                            # "FilteredWord": len(word) * mask_char,
-                        }
-                    )
-                else:
-                    # If not profane, keep original word and mark as clean
-                    self.moderated_json.append(
-                        {"OriginalWord": word, "IsProfane": False, "FilteredWord": word}
-                    )
+        # Only lines without a lexicon hit need the sentence level check
+        unchecked = [i for i, hits in enumerate(lexicon_hits) if not hits]
+        flagged_lines = {
+            i
+            for i, verdict in zip(
+                unchecked, self.scorer.predict_batch([normal_texts[i] for i in unchecked])
+            )
+            if verdict
+        }
+        moderated = [i for i, hits in enumerate(lexicon_hits) if hits or i in flagged_lines]
+
+        # Classify the remaining words of the moderated lines once, using the shared verdict cache
+        candidates = list(
+            dict.fromkeys(
+                word
+                for i in moderated
+                for position, word in enumerate(lines[i])
+                if position not in lexicon_hits[i] and not self.isGoodWord(word.lower())
+            )
+        )
+        verdicts = self.classify_words(candidates)
+
+        results = [[] for _ in sentences]
+        for i in moderated:
+            results[i] = self.moderate_words(lines[i], lexicon_hits[i], verdicts, mask_char, custom_words)
+        return results
+
+    def moderate_words(
+        self,
+        words: list,
+        lexicon_hits: set,
+        verdicts: dict,
+        mask_char: str,
+        custom_words: list | None,
+    ) -> list:
+        """
+        Build the per-word result of a sentence that was flagged as profane.
+        """
+        # Fresh result list per call, so one instance can serve concurrent requests
+        moderated_json = []
+
+        # Process each word in the normalized text
+        for position, word in enumerate(words):
+            if position in lexicon_hits:
+                # Part of a bad word or phrase from the lexicon
+                moderated_json.append(
+                    {
+                        "OriginalWord": word,
+                        "IsProfane": True,
+                        "FilteredWord": 4 * mask_char,
+                    }
+                )
+            elif self.isGoodWord(word.lower()):
+                moderated_json.append(
+                    {
+                        "OriginalWord": word,
+                        "IsProfane": False,
+                        "FilteredWord": word,
+                    }
+                )
+            # Check if word is profane using ML model or exists in custom words list
+            elif verdicts[word] or self.isBadWord(word=word, custom_words=custom_words):
+                # If profane, mask the word and mark as profane
+                moderated_json.append(
+                    {
+                        "OriginalWord": word,
+                        "IsProfane": True,
+                        "FilteredWord": 4 * mask_char,
+                        # "FilteredWord": len(word) * mask_char,
+                    }
+                )
+            else:
+                # If not profane, keep original word and mark as clean
+                moderated_json.append(
+                    {"OriginalWord": word, "IsProfane": False, "FilteredWord": word}
+                )
         # Return the list of processed words with their profanity status
-        return self.moderated_json
+        return moderated_json
+
+
+if __name__ == "__main__":
+    # Thread-safety stress test on one shared instance: python text.py [threads] [calls per thread]
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    tpf = TextProfanityFilter()
+    sentences = [
+        "You are a fucking asshole",
+        "have a nice day",
+        "sh1t happens to the b3st of us",
+        "what the hell is this crap",
+        "12345 !!!",
+        "",
+    ]
+    # Mask characters and custom words differ per case, so results leaking between calls show up
+    cases = [
+        (sentence, mask_char, custom_words)
+        for sentence in sentences
+        for mask_char, custom_words in (("*", []), ("#", ["nice"]), ("🤬", ["day", "happens"]))
+    ]
+    expected = [tpf.textProfanityFilteration(*case) for case in cases]
+
+    def run(worker: int) -> int:
+        mismatches = 0
+        for call in range(calls):
+            i = (worker + call) % len(cases)
+            if tpf.textProfanityFilteration(*cases[i]) != expected[i]:
+                mismatches += 1
+        return mismatches
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        mismatches = sum(executor.map(run, range(threads)))
+    print(f"{threads * calls - mismatches}/{threads * calls} concurrent calls match the serial output")
+    raise SystemExit(1 if mismatches else 0)
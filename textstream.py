@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from registry import model_registry
+from text import TextProfanityFilter
+
+BATCH_LINES = int(os.getenv("TXT_BATCH_LINES", 512))  # Lines sent to a worker at once
+MAX_LINE_CHARS = 65536  # Longer lines are split at whitespace to bound memory
+# Worker processes for the pool, 0 moderates inline (default on single core hosts)
+CPUS = os.cpu_count() or 1
+WORKERS = int(os.getenv("TXT_MODERATION_WORKERS", min(4, CPUS) if CPUS > 1 else 0))
+
+worker_filter = None  # TextProfanityFilter of a pool worker process
+pools = {}  # Worker count -> pool
+pool_lock = threading.Lock()
+
+
+def init_worker():
+    # Only the text model: importing models would also load audio and image code
+    global worker_filter
+    worker_filter = TextProfanityFilter()
+
+
+def moderate_batch(texts: list, mask_char: str, custom_words: list) -> list:
+    """Runs inside a pool worker: moderates a batch of lines with one classification pass."""
+    return worker_filter.moderate_lines(texts, mask_char=mask_char, custom_words=custom_words)
+
+
+def get_pool(workers: int = WORKERS) -> ProcessPoolExecutor:
+    """Returns the process-wide pool with that many workers, starting it on first use."""
+    with pool_lock:
+        if workers not in pools:
+            # Spawned, not forked: the app has threads that may hold locks during a fork
+            pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_worker,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return pools[workers]
+
+
+def read_lines(stream, max_chars: int = MAX_LINE_CHARS):
+    """
+    Read a text stream line by line without ever holding more than max_chars of a line.
+
+    Args:
+        stream: Text file object to read from
+        max_chars (int): Longest piece returned at once
+
+    Yields:
+        tuple: (text, ends_line) where ends_line is False for the leading pieces of a split line
+    """
+    carry = ""
+    while True:
+        read = stream.readline(max_chars)
+        piece = carry + read
+        carry = ""
+        if not piece:
+            break
+
+        if read.endswith("\n") or len(read) < max_chars:
+            # Whole line, or the last line of the file
+            yield piece.strip(), True
+            continue
+
+        # Over-long line: cut at the last whitespace and carry the rest over
+        cut = piece.rfind(" ")
+        if cut <= 0:
+            cut = len(piece)
+        yield piece[:cut].strip(), False
+        carry = piece[cut:]
+
+
+def batched(pieces, size: int):
+    batch = []
+    for piece in pieces:
+        batch.append(piece)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class TextStreamModerator:
+    """
+    Streams a text file through profanity filtering.
+
+    Lines are read lazily, grouped into batches and moderated in a process pool;
+    at most a few batches are in flight at any time, so memory stays bounded no
+    matter how large the file is. Results come back in file order.
+    """
+
+    def __init__(
+        self,
+        mask_char: str = "*",
+        custom_words: list | None = None,
+        workers: int = WORKERS,
+        textpf: TextProfanityFilter | None = None,
+    ):
+        self.mask_char = mask_char
+        self.custom_words = custom_words or []
+        self.workers = workers
+        self.textpf = textpf  # Used in inline mode (workers <= 0)
+        self.max_in_flight = max(1, 2 * workers)
+
+    def moderate(self, stream):
+        """
+        Moderate a text stream batch by batch.
+
+        Args:
+            stream: Text file object to read from
+
+        Yields:
+            tuple: (text, ends_line, result) per line piece, in file order
+        """
+        batches = batched(read_lines(stream), BATCH_LINES)
+
+        if self.workers <= 0:
+            # Inline mode, e.g. when worker processes are not allowed
+            tpf = self.textpf or model_registry.get("text_filter", TextProfanityFilter)
+            for batch in batches:
+                results = tpf.moderate_lines(
+                    [text for text, _ in batch], self.mask_char, self.custom_words
+                )
+                for (text, ends_line), result in zip(batch, results):
+                    yield text, ends_line, result
+            return
+
+        executor = get_pool(self.workers)
+        in_flight = deque()
+        for batch in batches:
+            in_flight.append(
+                (
+                    batch,
+                    executor.submit(
+                        moderate_batch,
+                        [text for text, _ in batch],
+                        self.mask_char,
+                        self.custom_words,
+                    ),
+                )
+            )
+            if len(in_flight) >= self.max_in_flight:
+                yield from self.collect(in_flight.popleft())
+
+        while in_flight:
+            yield from self.collect(in_flight.popleft())
+
+    @staticmethod
+    def collect(item):
+        batch, future = item
+        for (text, ends_line), result in zip(batch, future.result()):
+            yield text, ends_line, result
+
+    def moderate_to_file(self, stream, output_path: str):
+        """
+        Moderate a text stream, writing the moderated text incrementally.
+
+        Args:
+            stream: Text file object to read from
+            output_path (str): Where the moderated text is written
+
+        Yields:
+            dict: One record per line piece: {"line": n, "report": [...]}
+        """
+        line = 0
+        with open(output_path, "w", encoding="utf-8") as f:
+            for text, ends_line, result in self.moderate(stream):
+                # Lines without profanity come back empty, keep them unchanged
+                moderated = " ".join(x["FilteredWord"] for x in result) if result else text
+                f.write(moderated + ("\n" if ends_line else " "))
+                yield {"line": line, "report": result}
+                if ends_line:
+                    line += 1
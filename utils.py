@@ -2,6 +2,8 @@ import jwt
 import datetime
 from dotenv import load_dotenv
 import os
+import time
+import uuid
 
 load_dotenv()
 
@@ -53,3 +55,11 @@ def verify_token(token):
         return "Token expired"
     except jwt.InvalidTokenError:
         return "Invalid token"
+
+
+def unique_filename(extension: str) -> str:
+    """
+    Output file name that does not collide between concurrent requests,
+    e.g. "1718000000_3f2a9c1e4b7d.jpg". The timestamp keeps names sortable.
+    """
+    return f"{int(time.time())}_{uuid.uuid4().hex[:12]}.{extension.lstrip('.')}"
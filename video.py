@@ -1,20 +1,28 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
 from moviepy import VideoFileClip
 import os
 
-from image import ImageProfanityFilter
-from audio import AudioProfanityFilter
-from text import TextProfanityFilter
+import utils
+from models import get_audio_filter, get_image_filter, get_text_filter
+from sampling import AdaptiveFrameSampler
+from chunking import probe_duration
+from progress import ProgressTracker
+from regions import LOCALIZE
+from render import blur_filter, merge_intervals, merge_regions, render, replace_audio
+
+FRAME_BATCH_SIZE = int(os.getenv("FRAME_BATCH_SIZE", 16))  # Frames per CLIP forward pass
+DEBUG_FRAMES = os.getenv("DEBUG_FRAMES", "false").lower() in ("1", "true", "yes")  # Save sampled frames
 
 
 class VideoProfanityDetection:
     def __init__(
         self, input_video: str, custom_words: list = [], mask_char: str = "🤬"
     ):
-        # Initialize profanity filters for text, image, and audio
-        self.text = TextProfanityFilter()
-        self.image = ImageProfanityFilter()
-        self.audio = AudioProfanityFilter(textpf=self.text)
+        # Shared profanity filters for text, image, and audio, loaded once per process
+        self.text = get_text_filter()
+        self.image = get_image_filter()
+        self.audio = get_audio_filter()
 
         # Store input video path, mask character and custom_words for profanity detection
         self.input_video = input_video
@@ -30,7 +38,7 @@ class VideoProfanityDetection:
             video = VideoFileClip(input_video)  # Load the video file
             audio = video.audio  # Extract the audio track
             audio_output_path = (
-                f"storage/audio/{str(int(time.time()))}.mp3"  # Generate output path
+                f"storage/audio/{utils.unique_filename('mp3')}"  # Generate output path
             )
             audio.write_audiofile(audio_output_path)  # Save audio to file
             audio.close()  # Release audio resources
@@ -39,58 +47,136 @@ class VideoProfanityDetection:
         except Exception as e:
             print(f"An error occurred: {str(e)}")
 
-    def middle_frame(self):
+    def iter_frames(self, fps: float = 1.0):
         """
-        Extracts the middle frame of every second of the video and saves them in
-        storage/imgs/{timestamp}/ with the filename as the second number (e.g., 0.jpg, 1.jpg, ...).
-        Returns a list of file paths for the extracted frames.
+        Decodes fps evenly spaced frames of every second of the video (the middle
+        frame at fps=1) and yields them as RGB NumPy arrays, without writing
+        anything to disk.
+        With DEBUG_FRAMES enabled the frames are also saved in
+        storage/imgs/{timestamp}/ with the sample number as filename (e.g., 0.jpg, 1.jpg, ...).
+        Yields (second, frame) tuples.
         """
-        timestamp = str(int(time.time()))  # Unique directory for this extraction
-        output_dir = f"storage/imgs/{timestamp}"
-        os.makedirs(output_dir, exist_ok=True)  # Ensure output directory exists
-
-        video = VideoFileClip(self.input_video)  # Load the video
-        duration = int(video.duration)  # Get video duration in seconds
-
-        frame_paths = []
-        for sec in range(duration):
-            t = sec + 0.5  # Middle of the current second
-            if t > video.duration:
-                t = video.duration
-            frame = video.get_frame(t)  # Extract frame at time t
-            frame_path = os.path.join(output_dir, f"{sec}.jpg")  # Output path for frame
+        output_dir = None
+        if DEBUG_FRAMES:
             import imageio
 
-            imageio.imwrite(frame_path, frame)  # Save frame as image
-            frame_paths.append(frame_path)  # Collect frame path
+            output_dir = f"storage/imgs/{str(int(time.time()))}"
+            os.makedirs(output_dir, exist_ok=True)  # Ensure output directory exists
 
-        video.close()  # Release video resources
-        return frame_paths  # Return list of frame paths
+        video = VideoFileClip(self.input_video, audio=False)  # Load the video
+        try:
+            duration = int(video.duration)  # Get video duration in seconds
+            samples = int(duration * fps)
+            for index in range(samples):
+                t = (index + 0.5) / fps  # Middle of the current sample interval
+                if t > video.duration:
+                    t = video.duration
+                frame = video.get_frame(t)  # Extract frame at time t
+                if output_dir:
+                    imageio.imwrite(os.path.join(output_dir, f"{index}.jpg"), frame)
+                yield int((index + 0.5) / fps), frame
+        finally:
+            video.close()  # Release video resources
 
-    def blur_and_audio(self, blur_seconds: list, audio_path: str):
+    def detect_frames(
+        self,
+        sampling: dict | None = None,
+        progress: ProgressTracker | None = None,
+        localize: bool = False,
+    ) -> list:
+        """
+        Runs image profanity detection on the decoded frames, FRAME_BATCH_SIZE
+        frames per CLIP forward pass, holding at most one batch in memory.
+        Frames are sampled at SAMPLE_FPS; only scene changes (up to DETECT_FPS per
+        second) go through CLIP, near-duplicate frames reuse the last verdict.
+        Returns one detection per second, flagged if any of its frames is.
+        Sampling counters are written to sampling if given; progress gets the
+        seconds done and flagged seconds after every batch.
+        With localize, flagged frames are also localized and every detection
+        carries the regions of its frames.
+        """
+        sampler = AdaptiveFrameSampler()
+        verdicts = []  # CLIP verdicts of the analyzed frames
+        samples = []  # (second, index of the verdict it uses) per sampled frame
+        frame_detections = []
+        merged = 0  # Samples already merged into frame_detections
+
+        def merge_ready():
+            # Merge the frames of each second into one detection, as far as verdicts are known
+            nonlocal merged
+            while merged < len(samples) and samples[merged][1] < len(verdicts):
+                second, index = samples[merged]
+                merged += 1
+                if second == len(frame_detections):
+                    frame_detections.append({"isFlagged": False, "harmful_detected": []})
+                    if localize:
+                        frame_detections[-1]["regions"] = []
+                detection = frame_detections[second]
+                verdict = verdicts[index]
+                if verdict["isFlagged"]:
+                    if progress and not detection["isFlagged"]:
+                        progress.add_flagged_second(second, verdict["harmful_detected"])
+                    detection["isFlagged"] = True
+                    for category in verdict["harmful_detected"]:
+                        if category not in detection["harmful_detected"]:
+                            detection["harmful_detected"].append(category)
+                    for region in verdict.get("regions", []):
+                        if all(region["box"] != known["box"] for known in detection["regions"]):
+                            detection["regions"].append(region)
+            if progress:
+                progress.update("frame_detection", len(frame_detections))
+
+        def analyze(frames):
+            results = self.image.detect_batch(frames)
+            if localize:
+                # Grid cells are fixed per video, so regions of nearby frames share boxes
+                for result, regions in zip(results, self.image.localize_batch(frames, results)):
+                    result["regions"] = regions
+            return results
+
+        batch = []
+        for second, frame in self.iter_frames(fps=sampler.sample_fps):
+            if sampler.should_analyze(frame, second):
+                batch.append(frame)
+            samples.append((second, len(verdicts) + len(batch) - 1))
+            if len(batch) == FRAME_BATCH_SIZE:
+                verdicts += analyze(batch)
+                batch = []
+                merge_ready()
+        if batch:
+            verdicts += analyze(batch)
+        merge_ready()
+
+        if sampling is not None:
+            sampling.update(sampler.stats())
+        return frame_detections
+
+    def blur_and_audio(self, blur_seconds: list, audio_path: str, regions: dict | None = None):
         """
         Blurs the specified seconds of the video and overlays the provided audio.
         Returns the output video path.
+        If regions (second -> boxes) is given, only those boxes are blurred.
+        Flagged seconds are merged into intervals; with SMART_RENDER only the GOPs
+        overlapping them are re-encoded and the rest is stream-copied, and encoded
+        spans are split at keyframes and encoded in parallel within RENDER_CORES.
+        Without flagged seconds an H.264 video track is copied and only the audio replaced.
         Uses ffmpeg via subprocess for processing.
         """
         import subprocess
 
         input_video = self.input_video
-        output_filename = str(int(time.time())) + ".mp4"
+        output_filename = utils.unique_filename("mp4")
         output_path = f"storage/files/{output_filename}"  # Output video path
+        intervals = merge_regions(regions) if regions else merge_intervals(blur_seconds)
+
+        if not intervals:
+            if replace_audio(input_video, audio_path, output_path):
+                return output_filename
+        elif render(input_video, intervals, audio_path, output_path):
+            return output_filename
 
-        # Build ffmpeg filter for selective blur using boxblur
-        blur_exprs = []
-        for sec in blur_seconds:
-            blur_exprs.append(f"between(t,{sec},{sec+1})")
-        if blur_exprs:
-            enable_expr = "+".join(blur_exprs)
-            vf = f"boxblur=lr=6:lp=6:cr=6:cp=6:enable='{enable_expr}'"
-            vf_arg = ["-vf", vf]
-        else:
-            vf_arg = []
-
-        # Construct ffmpeg command for video and audio processing
+        # Fall back to one ffmpeg re-encoding the whole video, blurring the flagged intervals
+        blur_args = ["-vf", blur_filter(intervals)] if intervals else []
         cmd = [
             "ffmpeg",
             "-y",  # Overwrite output file if exists
@@ -102,7 +188,12 @@ class VideoProfanityDetection:
             "0:v:0",
             "-map",
             "1:a:0",
-            *vf_arg,
+            *blur_args,
+            # Keep every source frame and timestamp, as render() does
+            "-fps_mode",
+            "passthrough",
+            "-enc_time_base",
+            "-1",
             "-c:v",
             "libx264",
             "-c:a",
@@ -120,46 +211,108 @@ class VideoProfanityDetection:
 
         return output_filename  # Return path to processed video
 
-    def video_moderation(self, blur_video: bool):
+    def video_moderation(
+        self,
+        blur_video: bool,
+        progress: ProgressTracker | None = None,
+        localize: bool = LOCALIZE,
+    ):
         """
         Main moderation pipeline:
         - Extracts audio from video and applies audio profanity filtering.
-        - Extracts middle frames for each second and applies image profanity detection.
+        - Samples frames adaptively (denser around scene changes) and applies image profanity detection,
+          concurrently with the audio branch.
         - Blurs video segments where image profanity is detected (if blur_video is True).
-        - Combines moderated audio and video, and returns moderation data.
+        - Combines moderated audio and video, and returns moderation data
+          with per-stage timings.
+        If progress is given, every stage reports completed/total units and
+        flagged seconds and words as soon as they are known.
+        With localize, only the regions of flagged frames are blurred and each
+        image detection includes its regions.
         """
-        # Extract audio from the input video
-        audio_path = self.extract_audio(input_video=self.input_video)
+        timings = {}  # Seconds spent per stage, to see the critical path
+        sampling = {}  # Frames sampled vs. sent to CLIP
+        started = time.perf_counter()
+
+        def timed(stage, function, **kwargs):
+            stage_started = time.perf_counter()
+            result = function(**kwargs)
+            timings[stage] = round(time.perf_counter() - stage_started, 3)
+            return result
 
-        # Apply audio profanity filtering and get filtered audio and text moderation data
-        moderated_audio_output_path, text_profanity_data = (
-            self.audio.audioProfanityFilteration(
+        def audio_branch():
+            # Extract audio from the input video
+            if progress:
+                progress.start("extract_audio", total=1)
+            audio_path = timed("extract_audio", self.extract_audio, input_video=self.input_video)
+            if progress:
+                progress.finish("extract_audio")
+
+            # Apply audio profanity filtering and get filtered audio and text moderation data
+            whisper_timings = {}
+            result = timed(
+                "audio_moderation",
+                self.audio.audioProfanityFilteration,
                 audio_path=audio_path,
-                output_file_name=f"{str(int(time.time()))}.mp3",
+                output_file_name=utils.unique_filename("mp3"),
                 mask_char=self.mask_character,
                 custom_words=self.custom_words,
+                timings=whisper_timings,
+                progress=progress,
             )
-        )
+            timings.update(whisper_timings)
+            return result
+
+        def visual_branch():
+            # Sample frames adaptively and detect profanity in memory
+            if progress:
+                progress.start("frame_detection", total=int(probe_duration(self.input_video)))
+            detections = timed(
+                "frame_detection",
+                self.detect_frames,
+                sampling=sampling,
+                progress=progress,
+                localize=localize,
+            )
+            if progress:
+                progress.finish("frame_detection")
+            return detections
 
-        # Extract middle frames for each second of the video
-        middle_frame_paths = self.middle_frame()
+        # Audio and frames are independent until the final mux, so run them side by
+        # side; WHISPER_CPU_THREADS and CLIP_CPU_THREADS split the cores between them
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            audio_future = executor.submit(timed, "audio_branch", audio_branch)
+            visual_future = executor.submit(timed, "visual_branch", visual_branch)
+            moderated_audio_output_path, text_profanity_data = audio_future.result()
+            frame_detections = visual_future.result()
 
         image_detection_data = []  # Store image moderation results
         seconds_to_blur = []  # Store seconds to blur in video
-        for i, frame_path in enumerate(middle_frame_paths):
-            data = self.image.detect(frame_path)  # Detect profanity in frame
+        regions_to_blur = {}  # Boxes to blur per second, when localizing
+        for i, data in enumerate(frame_detections):
             if data["isFlagged"] and blur_video:
                 data["second"] = i
                 image_detection_data.append(data)
                 seconds_to_blur.append(i)  # Mark second for blurring
+                if localize:
+                    regions_to_blur[i] = [region["box"] for region in data["regions"]]
             else:
                 data["second"] = i
                 image_detection_data.append(data)
 
         # Apply blur to flagged seconds and combine with moderated audio
-        final_moderated_output = self.blur_and_audio(
-            blur_seconds=seconds_to_blur, audio_path="storage/files/"+moderated_audio_output_path
+        if progress:
+            progress.start("mux", total=1)
+        final_moderated_output = timed(
+            "mux",
+            self.blur_and_audio,
+            blur_seconds=seconds_to_blur,
+            audio_path="storage/files/" + moderated_audio_output_path,
+            regions=regions_to_blur,
         )
+        if progress:
+            progress.finish("mux")
+        timings["total"] = round(time.perf_counter() - started, 3)
 
         if final_moderated_output is None:
             print("Error: Failed to process video with ffmpeg.")
@@ -173,6 +326,8 @@ class VideoProfanityDetection:
             "moderated_video_path": final_moderated_output,
             "text_moderated_data": text_profanity_data,
             "image_detections": image_detection_data,
+            "timings": timings,
+            "sampling": sampling,
         }
 
         return final_data  # Return moderation results